@@ -0,0 +1,256 @@
+import argparse
+from datetime import datetime
+import json
+import threading
+
+import numpy as np
+
+from exceptions import HistoryError
+from history import HISTORY_DIR, RECORD, STATUS_CODES, StatusHistory
+
+
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'), ('homework_id', '<i8'), ('status', 'u1')
+])
+if RECORD_DTYPE.itemsize != RECORD.size:
+    raise HistoryError(
+        f'Размер записи NumPy ({RECORD_DTYPE.itemsize} байт) не совпадает'
+        f' с форматом истории ({RECORD.size} байт).'
+    )
+
+REVIEWING = STATUS_CODES['reviewing']
+VERDICT_CODES = (STATUS_CODES['approved'], STATUS_CODES['rejected'])
+VERDICTS = np.array(VERDICT_CODES, dtype='u1')
+UNKNOWN_PROJECT = 'unknown'
+INITIAL_CAPACITY = 1024
+DAY = 24 * 60 * 60
+
+
+class TurnaroundStats:
+    """
+    Время проверки: от статуса reviewing до approved/rejected.
+
+    Длительности хранятся в массивах NumPy (длительность, время
+    вердикта, код проекта) и дописываются по мере поступления событий,
+    поэтому отчеты и оценки не требуют повторного чтения истории.
+    """
+
+    def __init__(self, projects=None):
+        self._lock = threading.Lock()
+        self._durations = np.empty(INITIAL_CAPACITY, dtype='f8')
+        self._finished_at = np.empty(INITIAL_CAPACITY, dtype='f8')
+        self._project_codes = np.empty(INITIAL_CAPACITY, dtype='i4')
+        self._size = 0
+        self._open = {}
+        self._project_of = dict(projects or {})
+        self._codes = {}
+        self._names = []
+
+    def __len__(self):
+        return self._size
+
+    @classmethod
+    def from_history(cls, history, projects=None):
+        """
+        Функция строит статистику по записанной истории статусов
+        векторными операциями над всеми переходами сразу.
+        """
+        stats = cls(projects)
+        records = np.frombuffer(history.snapshot(), dtype=RECORD_DTYPE)
+        if not len(records):
+            return stats
+        records = records[np.lexsort(
+            (records['timestamp'], records['homework_id'])
+        )]
+        ids = records['homework_id']
+        timestamps = records['timestamp']
+        statuses = records['status']
+
+        same = ids[1:] == ids[:-1]
+        finished = (
+            same & (statuses[:-1] == REVIEWING)
+            & np.isin(statuses[1:], VERDICTS)
+        )
+        finished_ids = ids[1:][finished]
+        stats._extend(
+            timestamps[1:][finished] - timestamps[:-1][finished],
+            timestamps[1:][finished],
+            stats._project_codes_for(finished_ids),
+        )
+
+        # Работы, последний статус которых reviewing, еще на проверке.
+        last = np.append(~same, True)
+        waiting = last & (statuses == REVIEWING)
+        stats._open = dict(zip(
+            ids[waiting].tolist(), timestamps[waiting].tolist()
+        ))
+        return stats
+
+    def update(self, homework_id, status, timestamp, project=None):
+        """Функция учитывает новый переход статуса одной работы."""
+        with self._lock:
+            if project is not None:
+                self._project_of[homework_id] = project
+            code = STATUS_CODES.get(status)
+            if code == REVIEWING:
+                self._open[homework_id] = timestamp
+                return
+            if code not in VERDICT_CODES:
+                return
+            started_at = self._open.pop(homework_id, None)
+            if started_at is None:
+                return
+            self._extend(
+                np.array([timestamp - started_at]),
+                np.array([timestamp]),
+                np.array([self._project_code(homework_id)]),
+            )
+
+    def median(self, project=None):
+        """
+        Функция возвращает медианное время проверки в секундах
+        (по проекту или по всем работам) либо None.
+        """
+        durations, _, codes = self._arrays()
+        if project is not None:
+            code = self._codes.get(project)
+            if code is None:
+                return None
+            durations = durations[codes == code]
+        if not len(durations):
+            return None
+        return float(np.median(durations))
+
+    def report(self, window=None):
+        """
+        Функция возвращает статистику по проектам и периодам длиной
+        window секунд: количество проверок, медиану и 90-й процентиль.
+        """
+        durations, finished_at, codes = self._arrays()
+        if not len(durations):
+            return []
+        if window:
+            buckets = (finished_at // window).astype('i8')
+        else:
+            buckets = np.zeros(len(durations), dtype='i8')
+        order = np.lexsort((durations, buckets, codes))
+        durations = durations[order]
+        keys = np.stack((codes[order], buckets[order]), axis=1)
+        keys, starts = np.unique(keys, axis=0, return_index=True)
+        rows = []
+        groups = np.split(durations, starts[1:])
+        for (code, bucket), group in zip(keys.tolist(), groups):
+            rows.append({
+                'project': self._names[code],
+                'window_start': bucket * window if window else None,
+                'count': len(group),
+                'median': float(np.median(group)),
+                'p90': float(np.percentile(group, 90)),
+            })
+        return rows
+
+    def _arrays(self):
+        with self._lock:
+            size = self._size
+            return (
+                self._durations[:size].copy(),
+                self._finished_at[:size].copy(),
+                self._project_codes[:size].copy(),
+            )
+
+    def _extend(self, durations, finished_at, codes):
+        required = self._size + len(durations)
+        if required > len(self._durations):
+            capacity = max(required, len(self._durations) * 2)
+            for name in ('_durations', '_finished_at', '_project_codes'):
+                array = getattr(self, name)
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self._size] = array[:self._size]
+                setattr(self, name, grown)
+        self._durations[self._size:required] = durations
+        self._finished_at[self._size:required] = finished_at
+        self._project_codes[self._size:required] = codes
+        self._size = required
+
+    def _project_code(self, homework_id):
+        name = self._project_of.get(homework_id, UNKNOWN_PROJECT)
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self._names)
+            self._names.append(name)
+        return code
+
+    def _project_codes_for(self, homework_ids):
+        unique, inverse = np.unique(homework_ids, return_inverse=True)
+        unique = unique.tolist()
+        codes = np.array(
+            [self._project_code(homework_id) for homework_id in unique],
+            dtype='i4'
+        )
+        return codes[inverse] if len(codes) else codes
+
+
+class AnalyticsSink:
+    """Приемник событий шины: дополняет статистику новыми переходами."""
+
+    name = 'analytics'
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def handle(self, event):
+        if event.kind != 'status_changed' or event.homework_id is None:
+            return
+        self.stats.update(
+            event.homework_id, event.status, event.changed_at,
+            event.lesson_name
+        )
+
+
+def format_duration(seconds):
+    """Функция форматирует длительность в часах."""
+    return f'{seconds / 3600:.1f} ч'
+
+
+def main(argv=None):
+    """Отчет о времени проверки работ из командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Время проверки домашних работ.'
+    )
+    parser.add_argument('--dir', default=HISTORY_DIR,
+                        help='Каталог сегментов истории.')
+    parser.add_argument('--window', type=float, default=0,
+                        help='Длина периода в днях (0 - без разбивки).')
+    parser.add_argument('--projects',
+                        help='JSON-файл: id работы -> название проекта.')
+    args = parser.parse_args(argv)
+
+    projects = None
+    if args.projects:
+        with open(args.projects, encoding='utf-8') as stream:
+            projects = {
+                int(homework_id): project
+                for homework_id, project in json.load(stream).items()
+            }
+    try:
+        history = StatusHistory(args.dir, read_only=True)
+    except HistoryError as error:
+        parser.exit(1, f'{error}\n')
+    try:
+        stats = TurnaroundStats.from_history(history, projects)
+    finally:
+        history.close()
+
+    for row in stats.report(args.window * DAY):
+        period = ''
+        if row['window_start'] is not None:
+            period = datetime.fromtimestamp(row['window_start']).date()
+        print(
+            f"{row['project']:<30} {period!s:<10} {row['count']:>6}"
+            f" медиана {format_duration(row['median'])}"
+            f" p90 {format_duration(row['p90'])}"
+        )
+
+
+if __name__ == '__main__':
+    main()
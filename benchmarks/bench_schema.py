@@ -0,0 +1,117 @@
+"""
+Сравнение скомпилированной схемы с исходными проверками
+check_response() и parse_status() на 100 000 синтетических работ.
+
+Запуск: python benchmarks/bench_schema.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schema import HomeworkSchema  # noqa: E402
+
+
+HOMEWORK_STATUSES = {
+    'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
+    'reviewing': 'Работа взята на проверку ревьюером.',
+    'rejected': 'Работа проверена: у ревьюера есть замечания.'
+}
+HOMEWORK_NAME = 'homework_name'
+HOMEWORK_STATUS = 'status'
+HOMEWORKS_KEY = 'homeworks'
+
+RECORDS = 100000
+REPEAT = 5
+
+
+def legacy_check_response(response):
+    """Исходная проверка ответа (без выбора первой работы)."""
+    if HOMEWORKS_KEY not in response:
+        msg = f'Отсутствует ожидаемый ключ "{HOMEWORKS_KEY}" в ответе API.'
+        raise TypeError(msg)
+
+    homeworks = response['homeworks']
+    homeworks_type = type(homeworks)
+
+    if not isinstance(homeworks, list):
+        msg = (f'Полученный тип данных "{homeworks_type}" в ответе API'
+               ' не соответствует ожидаемому типу данных "list".')
+        raise TypeError(msg)
+    return homeworks
+
+
+def legacy_validate_homework(homework):
+    """Исходная проверка работы из parse_status() (без текста сообщения)."""
+    if HOMEWORK_NAME not in homework:
+        msg = f'Отсутствует ожидаемый ключ "{HOMEWORK_NAME}" в ответе API.'
+        raise KeyError(msg)
+
+    elif HOMEWORK_STATUS not in homework:
+        msg = (f'Отсутствует ожидаемый ключ "{HOMEWORK_STATUS}" '
+               'в ответе API.')
+        raise KeyError(msg)
+
+    else:
+        homework_name = homework.get(HOMEWORK_NAME)
+        homework_status = homework.get(HOMEWORK_STATUS)
+
+    if homework_status not in HOMEWORK_STATUSES:
+        msg = ('Недокументированный статус домашней работы'
+               f' "{homework_status}", обнаруженный в ответе API.')
+        raise KeyError(msg)
+    return homework_name, homework_status
+
+
+def legacy_validate(response):
+    return [
+        legacy_validate_homework(homework)
+        for homework in legacy_check_response(response)
+    ]
+
+
+def make_response(records):
+    statuses = list(HOMEWORK_STATUSES)
+    return {
+        'homeworks': [
+            {
+                'id': number,
+                'homework_name': f'student__hw{number}.zip',
+                'status': random.choice(statuses),
+                'reviewer_comment': 'Комментарий',
+                'date_updated': '2021-10-09T15:34:45Z',
+                'lesson_name': 'Итоговый проект',
+            }
+            for number in range(records)
+        ],
+        'current_date': int(time.time()),
+    }
+
+
+def best_of(function, response):
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        function(response)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    random.seed(0)
+    response = make_response(RECORDS)
+    schema = HomeworkSchema(HOMEWORK_STATUSES)
+    assert schema.validate(response) == legacy_validate(response)
+
+    legacy = best_of(legacy_validate, response)
+    compiled = best_of(schema.validate, response)
+    print(f'Работ: {RECORDS}, лучший из {REPEAT} запусков')
+    print(f'исходные проверки:      {legacy * 1000:8.2f} мс')
+    print(f'скомпилированная схема: {compiled * 1000:8.2f} мс')
+    print(f'ускорение:              {legacy / compiled:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
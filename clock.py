@@ -0,0 +1,73 @@
+from contextlib import contextmanager
+import time
+
+
+class SystemClock:
+    """Часы планировщика по умолчанию: реальное время."""
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def wait(self, event, timeout):
+        return event.wait(timeout)
+
+
+class VirtualClock:
+    """
+    Виртуальные часы для воспроизведения записанного трафика.
+    Ожидание не спит, а сдвигает время вперед, поэтому часы работы
+    бота проигрываются за доли секунды.
+    """
+
+    def __init__(self, start=0.0):
+        self._now = float(start)
+        self._monotonic = 0.0
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._monotonic
+
+    def advance(self, seconds):
+        """Функция сдвигает виртуальное время вперед."""
+        seconds = max(0.0, seconds)
+        self._now += seconds
+        self._monotonic += seconds
+
+    def wait(self, event, timeout):
+        if not event.is_set() and timeout:
+            self.advance(timeout)
+        return event.is_set()
+
+
+_clock = SystemClock()
+
+
+def current_time():
+    """Функция возвращает текущее время планировщика (unix time)."""
+    return _clock.time()
+
+
+def current_monotonic():
+    """Функция возвращает монотонное время планировщика."""
+    return _clock.monotonic()
+
+
+def wait_event(event, timeout):
+    """Функция ждет события не дольше timeout секунд по часам планировщика."""
+    return _clock.wait(event, timeout)
+
+
+@contextmanager
+def use_clock(clock):
+    """Контекстный менеджер: временно подменяет часы планировщика."""
+    global _clock
+    previous, _clock = _clock, clock
+    try:
+        yield clock
+    finally:
+        _clock = previous
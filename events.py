@@ -0,0 +1,295 @@
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from email.message import EmailMessage
+import json
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+
+import requests
+
+from clock import current_time
+from lanes import LANE_ERROR, lane_for_status
+
+
+EVENTS_WEBHOOK_URL = os.getenv('EVENTS_WEBHOOK_URL')
+EVENTS_AUDIT_LOG = os.getenv('EVENTS_AUDIT_LOG')
+EVENTS_SMTP_HOST = os.getenv('EVENTS_SMTP_HOST')
+EVENTS_EMAIL_TO = os.getenv('EVENTS_EMAIL_TO')
+
+SINK_QUEUE_SIZE = 1000
+WEBHOOK_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StatusChanged:
+    """Событие: изменился статус проверки домашней работы."""
+
+    homework_name: str
+    status: str
+    message: str
+    homework_id: int = None
+    lesson_name: str = None
+    date_updated: str = None
+    created_at: float = field(default_factory=current_time)
+    kind: str = 'status_changed'
+
+    @property
+    def key(self):
+        """
+        Ключ идемпотентности: работа, статус и время его изменения.
+        После повторной отправки работы тот же статус получает новый
+        date_updated, поэтому каждый круг ревью доставляется.
+        """
+        homework = self.homework_id or self.homework_name
+        changed_at = self.date_updated or self.created_at
+        return f'{homework}:{self.status}:{changed_at}'
+
+    @property
+    def changed_at(self):
+        """
+        Время изменения статуса (unix time) по date_updated из API.
+        Без него (или при неразборчивом значении) - время, когда бот
+        заметил изменение.
+        """
+        if self.date_updated:
+            try:
+                # fromisoformat до Python 3.11 не принимает суффикс Z.
+                return datetime.fromisoformat(
+                    self.date_updated.replace('Z', '+00:00')
+                ).timestamp()
+            except (AttributeError, ValueError):
+                logger.warning(
+                    f'Неизвестный формат date_updated: {self.date_updated}.'
+                )
+        return self.created_at
+
+    @property
+    def lane(self):
+        """Полоса доставки: вердикты ревьюера идут первыми."""
+        return lane_for_status(self.status)
+
+    @classmethod
+    def from_homework(cls, homework, message):
+        """Функция создает событие из домашней работы и текста parse_status."""
+        homework = homework or {}
+        return cls(
+            homework.get('homework_name', ''),
+            homework.get('status', ''),
+            message,
+            homework.get('id'),
+            homework.get('lesson_name'),
+            homework.get('date_updated'),
+        )
+
+    def to_dict(self):
+        """Функция возвращает событие в виде словаря для сериализации."""
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class ErrorOccurred:
+    """Событие: сбой в работе программы."""
+
+    message: str
+    created_at: float = field(default_factory=current_time)
+    kind: str = 'error'
+
+    @property
+    def key(self):
+        """Ключ идемпотентности: сообщение об ошибке и время сбоя."""
+        return f'error:{self.created_at}:{self.message}'
+
+    @property
+    def lane(self):
+        """Полоса доставки сообщений об ошибках."""
+        return LANE_ERROR
+
+    def to_dict(self):
+        """Функция возвращает событие в виде словаря для сериализации."""
+        return asdict(self)
+
+
+class JsonlSink:
+    """Приемник событий: журнал аудита в формате JSON Lines."""
+
+    name = 'jsonl'
+
+    def __init__(self, path):
+        self.path = path
+
+    def handle(self, event):
+        with open(self.path, 'a', encoding='utf-8') as stream:
+            stream.write(
+                json.dumps(event.to_dict(), ensure_ascii=False) + '\n'
+            )
+
+
+class WebhookSink:
+    """Приемник событий: POST-запрос с JSON на внешний адрес."""
+
+    name = 'webhook'
+
+    def __init__(self, url, timeout=WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def handle(self, event):
+        response = requests.post(
+            self.url, json=event.to_dict(), timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+class EmailSink:
+    """Приемник событий: письмо через SMTP-шлюз."""
+
+    name = 'email'
+
+    def __init__(self, host, to_address, from_address='bot@localhost'):
+        self.host = host
+        self.to_address = to_address
+        self.from_address = from_address
+
+    def handle(self, event):
+        email = EmailMessage()
+        email['Subject'] = 'Статус домашней работы'
+        email['From'] = self.from_address
+        email['To'] = self.to_address
+        email.set_content(event.message)
+        with smtplib.SMTP(self.host) as smtp:
+            smtp.send_message(email)
+
+
+class _SinkWorker:
+    """
+    Очередь и поток доставки для одного приемника.
+    При переполнении очереди вытесняется самое старое событие,
+    чтобы медленный приемник не задерживал опрос API.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sink, queue_size):
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.failed = 0
+        self.delivered = 0
+        self.thread = threading.Thread(
+            target=self._run, name=f'sink-{sink.name}', daemon=True
+        )
+
+    def offer(self, event):
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self.queue.task_done()
+                self.dropped += 1
+                logger.warning(
+                    f'Очередь приемника "{self.sink.name}" переполнена,'
+                    ' старое событие отброшено.'
+                )
+
+    def stop(self, timeout=None):
+        # Сигнал остановки ставится в очередь с ожиданием, чтобы не
+        # вытеснить им еще не доставленные события.
+        try:
+            self.queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning(
+                f'Приемник "{self.sink.name}" не успел доставить события.'
+            )
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            try:
+                if event is self._STOP:
+                    return
+                self.sink.handle(event)
+                self.delivered += 1
+            except Exception as error:
+                self.failed += 1
+                logger.error(
+                    f'Сбой приемника "{self.sink.name}": {error}'
+                )
+            finally:
+                self.queue.task_done()
+
+
+class EventBus:
+    """
+    Шина событий: одно событие из цикла опроса раздается всем
+    зарегистрированным приемникам. У каждого приемника своя очередь
+    и свой поток, поэтому публикация не блокируется.
+    """
+
+    def __init__(self, queue_size=SINK_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._workers = []
+
+    def register(self, sink, queue_size=None):
+        """Функция регистрирует приемник и запускает его поток."""
+        worker = _SinkWorker(sink, queue_size or self.queue_size)
+        worker.thread.start()
+        self._workers.append(worker)
+        return sink
+
+    def publish(self, event):
+        """Функция раздает событие всем приемникам без ожидания доставки."""
+        for worker in self._workers:
+            worker.offer(event)
+
+    def stats(self):
+        """Функция возвращает счетчики доставки по приемникам."""
+        return {
+            worker.sink.name: {
+                'queued': worker.queue.qsize(),
+                'delivered': worker.delivered,
+                'failed': worker.failed,
+                'dropped': worker.dropped,
+            }
+            for worker in self._workers
+        }
+
+    def close(self, timeout=None):
+        """
+        Функция дожидается доставки поставленных событий и
+        останавливает потоки приемников.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            if deadline is None:
+                return None
+            return max(0, deadline - time.monotonic())
+
+        for worker in self._workers:
+            worker.stop(remaining())
+        for worker in self._workers:
+            worker.thread.join(remaining())
+        self._workers = []
+
+
+def sinks_from_env():
+    """Функция создает дополнительные приемники по переменным окружения."""
+    sinks = []
+    if EVENTS_AUDIT_LOG:
+        sinks.append(JsonlSink(EVENTS_AUDIT_LOG))
+    if EVENTS_WEBHOOK_URL:
+        sinks.append(WebhookSink(EVENTS_WEBHOOK_URL))
+    if EVENTS_SMTP_HOST and EVENTS_EMAIL_TO:
+        sinks.append(EmailSink(EVENTS_SMTP_HOST, EVENTS_EMAIL_TO))
+    return sinks
@@ -26,3 +26,33 @@ class InvalidResponse(Exception):
 class SendMessageError(Exception):
     """Исключение вызываемое при сбое отправки сообщения в Telegram."""
     pass
+
+
+class SubscriptionError(Exception):
+    """Исключение для некорректной подписки в реестре."""
+    pass
+
+
+class VaultError(Exception):
+    """Исключение для ошибок хранилища токенов."""
+    pass
+
+
+class OutboxError(Exception):
+    """Исключение для ошибок журнала уведомлений."""
+    pass
+
+
+class HistoryError(Exception):
+    """Исключение для ошибок истории статусов."""
+    pass
+
+
+class PollDeadlineExceeded(Exception):
+    """Исключение для истекшего срока опроса API."""
+    pass
+
+
+class ReplayError(Exception):
+    """Исключение для ошибок воспроизведения записанного трафика."""
+    pass
@@ -0,0 +1,355 @@
+import argparse
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+import mmap
+import os
+import struct
+import threading
+import time
+
+from exceptions import HistoryError
+
+
+HISTORY_DIR = os.getenv('HISTORY_DIR', 'history')
+
+# Запись: время перехода, id работы, код статуса (17 байт).
+RECORD = struct.Struct('<dqB')
+SEGMENT_RECORDS = 1 << 20
+INDEX_STRIDE = 1024
+SEGMENT_SUFFIX = '.seg'
+
+STATUS_CODES = {'reviewing': 1, 'approved': 2, 'rejected': 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+UNKNOWN_STATUS = 0
+
+
+class Segment:
+    """
+    Файл сегмента истории: упакованные записи фиксированной длины,
+    отсортированные по времени. Чтение идет через mmap, разреженный
+    индекс хранит время каждой INDEX_STRIDE-й записи.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.index = []
+        self.first_ts = None
+        self.last_ts = None
+        self._mmap = None
+        self.refresh()
+
+    def refresh(self):
+        """Функция отображает в память дописанные в сегмент записи."""
+        count = os.path.getsize(self.path) // RECORD.size
+        if count == self.count:
+            return
+        if self._mmap is not None:
+            self._mmap.close()
+        with open(self.path, 'rb') as stream:
+            self._mmap = mmap.mmap(
+                stream.fileno(), count * RECORD.size, access=mmap.ACCESS_READ
+            )
+        for position in range(
+                -(-self.count // INDEX_STRIDE) * INDEX_STRIDE,
+                count, INDEX_STRIDE):
+            self.index.append(self._timestamp(position))
+        self.count = count
+        self.first_ts = self._timestamp(0)
+        self.last_ts = self._timestamp(count - 1)
+
+    def position(self, timestamp, right=False):
+        """
+        Функция возвращает номер первой записи со временем не меньше
+        (right=True: больше) заданного.
+        """
+        search = bisect_right if right else bisect_left
+        block = max(0, search(self.index, timestamp) - 1)
+        low = block * INDEX_STRIDE
+        high = min(self.count, low + INDEX_STRIDE * 2)
+        # Двоичный поиск внутри блока разреженного индекса.
+        while low < high:
+            middle = (low + high) // 2
+            value = self._timestamp(middle)
+            if value < timestamp or (right and value == timestamp):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def records(self, start=0, stop=None):
+        """Функция возвращает записи сегмента в диапазоне номеров."""
+        stop = self.count if stop is None else stop
+        if self._mmap is None or start >= stop:
+            return iter(())
+        view = memoryview(self._mmap)[start * RECORD.size:stop * RECORD.size]
+        return RECORD.iter_unpack(view)
+
+    def records_bytes(self):
+        """Функция возвращает копию записей сегмента."""
+        return self._mmap[:self.count * RECORD.size]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _timestamp(self, position):
+        return RECORD.unpack_from(self._mmap, position * RECORD.size)[0]
+
+
+class StatusHistory:
+    """
+    Локальная история переходов статусов домашних работ.
+    Записи только дописываются в активный сегмент; заполненные
+    сегменты закрываются и могут быть объединены compact().
+
+    С read_only=True история открывается только для чтения (query,
+    snapshot): каталог и сегменты не создаются и не обрезаются, поэтому
+    так можно читать историю работающего бота.
+    """
+
+    def __init__(self, directory=HISTORY_DIR,
+                 segment_records=SEGMENT_RECORDS, read_only=False):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+        elif not os.path.isdir(directory):
+            raise HistoryError(f'Каталог истории {directory} не найден.')
+        self._segments = []
+        self._active = None
+        self._last_ts = 0.0
+        self._discover()
+        if read_only:
+            return
+        if self._segments:
+            last = self._segments[-1]
+            self._last_ts = last.last_ts or 0.0
+            self._active_records = last.count
+            self._active = open(last.path, 'ab')
+            # Обрезаем недописанную запись, оставшуюся после падения.
+            self._active.truncate(last.count * RECORD.size)
+        else:
+            self._roll()
+
+    def append(self, homework_id, status, timestamp=None):
+        """Функция записывает переход статуса домашней работы."""
+        self.append_many([(homework_id, status, timestamp)])
+
+    def append_many(self, transitions):
+        """Функция записывает переходы пачкой одной записью в файл."""
+        self._check_writable()
+        with self._lock:
+            for homework_id, status, timestamp in transitions:
+                if self._active_records >= self.segment_records:
+                    self._active.flush()
+                    self._roll()
+                # Время в сегменте не убывает: на этом держится индекс.
+                timestamp = max(
+                    self._last_ts,
+                    time.time() if timestamp is None else timestamp
+                )
+                self._active.write(RECORD.pack(
+                    timestamp, int(homework_id),
+                    STATUS_CODES.get(status, UNKNOWN_STATUS)
+                ))
+                self._active_records += 1
+                self._last_ts = timestamp
+            self._active.flush()
+
+    def query(self, start=None, end=None, homework_id=None):
+        """
+        Функция возвращает переходы за период [start, end]:
+        список кортежей (время, id работы, статус).
+        """
+        start = float('-inf') if start is None else start
+        end = float('inf') if end is None else end
+        result = []
+        with self._lock:
+            if self.read_only:
+                self._discover()
+            for segment in self._segments:
+                segment.refresh()
+                if (not segment.count or segment.last_ts < start
+                        or segment.first_ts > end):
+                    continue
+                first = (
+                    segment.position(start)
+                    if start > segment.first_ts else 0
+                )
+                last = (
+                    segment.position(end, right=True)
+                    if end < segment.last_ts else segment.count
+                )
+                for timestamp, record_id, code in segment.records(
+                        first, last):
+                    if homework_id is None or record_id == homework_id:
+                        result.append(
+                            (timestamp, record_id, STATUS_NAMES.get(code))
+                        )
+        return result
+
+    def snapshot(self):
+        """
+        Функция возвращает копию всех записей истории одним блоком байт
+        (формат RECORD), например для векторной обработки.
+        """
+        with self._lock:
+            if self.read_only:
+                self._discover()
+            else:
+                self._active.flush()
+            chunks = []
+            for segment in self._segments:
+                segment.refresh()
+                if segment.count:
+                    chunks.append(segment.records_bytes())
+        return b''.join(chunks)
+
+    def history(self, homework_id):
+        """Функция возвращает все переходы статусов одной работы."""
+        return self.query(homework_id=homework_id)
+
+    def compact(self, drop_before=None):
+        """
+        Функция объединяет закрытые сегменты в один. Записи, повторяющие
+        предыдущий статус той же работы, и записи старше drop_before
+        отбрасываются. Возвращает количество оставшихся записей.
+        """
+        self._check_writable()
+        with self._lock:
+            closed = self._segments[:-1]
+            if not closed:
+                return 0
+            latest = {}
+            path = closed[0].path
+            tmp_path = path + '.tmp'
+            kept = 0
+            with open(tmp_path, 'wb') as stream:
+                for segment in closed:
+                    segment.refresh()
+                    for record in segment.records():
+                        timestamp, record_id, code = record
+                        if drop_before is not None and timestamp < drop_before:
+                            continue
+                        if latest.get(record_id) == code:
+                            continue
+                        latest[record_id] = code
+                        stream.write(RECORD.pack(*record))
+                        kept += 1
+                stream.flush()
+                os.fsync(stream.fileno())
+            for segment in closed:
+                segment.close()
+            os.replace(tmp_path, path)
+            for segment in closed[1:]:
+                os.remove(segment.path)
+            self._segments = [Segment(path)] + self._segments[-1:]
+            return kept
+
+    def close(self):
+        """Функция закрывает активный сегмент и отображения."""
+        with self._lock:
+            if self._active is not None:
+                self._active.close()
+            for segment in self._segments:
+                segment.close()
+
+    def _discover(self):
+        # Читатель подхватывает сегменты, созданные писателем после
+        # открытия истории.
+        known = {segment.path for segment in self._segments}
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name.endswith(SEGMENT_SUFFIX) and path not in known:
+                self._segments.append(Segment(path))
+
+    def _check_writable(self):
+        if self.read_only:
+            raise HistoryError(
+                f'История {self.directory} открыта только для чтения.'
+            )
+
+    def _roll(self):
+        if self._active is not None:
+            self._active.close()
+        number = 1
+        if self._segments:
+            name = os.path.basename(self._segments[-1].path)
+            number = int(name[:-len(SEGMENT_SUFFIX)]) + 1
+        path = os.path.join(
+            self.directory, f'{number:08d}{SEGMENT_SUFFIX}'
+        )
+        if os.path.exists(path):
+            raise HistoryError(f'Сегмент истории {path} уже существует.')
+        self._active = open(path, 'ab')
+        self._active_records = 0
+        self._segments.append(Segment(path))
+
+
+class HistorySink:
+    """Приемник событий шины: записывает изменения статусов в историю."""
+
+    name = 'history'
+
+    def __init__(self, history):
+        self.history = history
+
+    def handle(self, event):
+        if event.kind != 'status_changed' or event.homework_id is None:
+            return
+        self.history.append(
+            event.homework_id, event.status, event.changed_at
+        )
+
+
+def main(argv=None):
+    """Запросы к истории статусов из командной строки."""
+    parser = argparse.ArgumentParser(description='История статусов работ.')
+    parser.add_argument('--dir', default=HISTORY_DIR,
+                        help='Каталог сегментов истории.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    show_parser = commands.add_parser(
+        'show', help='Переходы статусов одной работы.'
+    )
+    show_parser.add_argument('homework_id', type=int)
+    range_parser = commands.add_parser(
+        'range', help='Переходы за период (unix time).'
+    )
+    range_parser.add_argument('start', type=float)
+    range_parser.add_argument('end', type=float)
+    compact_parser = commands.add_parser(
+        'compact', help='Объединить закрытые сегменты.'
+    )
+    compact_parser.add_argument('--drop-before', type=float)
+    args = parser.parse_args(argv)
+
+    try:
+        history = StatusHistory(
+            args.dir, read_only=args.command != 'compact'
+        )
+    except HistoryError as error:
+        parser.exit(1, f'{error}\n')
+    try:
+        if args.command == 'compact':
+            kept = history.compact(args.drop_before)
+            print(f'Записей после сжатия: {kept}')
+            return
+        if args.command == 'show':
+            transitions = history.history(args.homework_id)
+        else:
+            transitions = history.query(args.start, args.end)
+        for timestamp, homework_id, status in transitions:
+            moment = datetime.fromtimestamp(timestamp).isoformat(
+                sep=' ', timespec='seconds'
+            )
+            print(f'{moment} {homework_id} {status}')
+    finally:
+        history.close()
+
+
+if __name__ == '__main__':
+    main()
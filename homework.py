@@ -3,26 +3,44 @@ import logging
 from logging import StreamHandler
 import os
 import sys
-import time
 
-import requests
 from dotenv import load_dotenv
 from telegram import Bot
 
+from clock import current_time
+from events import ErrorOccurred, EventBus, StatusChanged, sinks_from_env
 from exceptions import (
-    EmptyHomeworksDict, InvalidRequest, InvalidResponse, SendMessageError
+    EmptyHomeworksDict, InvalidRequest, InvalidResponse, SendMessageError,
+    VaultError
 )
+from history import HISTORY_DIR, HistorySink, StatusHistory
+from instrumentation import (
+    install_profiler_trigger, poll_finished, poll_started, traced
+)
+from lifecycle import SHUTDOWN, STATE_PATH, BotState
+from outbox import OUTBOX_PATH, Outbox
+from ratelimit import RATE_LIMITER
+from recorder import RECORDER
+from schema import HomeworkSchema
+from upstream import fetch
+from vault import VAULT_KEYS, TokenVault, load_keys
 
 
 load_dotenv()
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
+# Вместо токена в окружении можно указать id токена в хранилище vault.py.
+PRACTICUM_TOKEN_ID = os.getenv('PRACTICUM_TOKEN_ID')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
 RETRY_TIME = 600
+TELEGRAM_TIMEOUT = 10
+QUOTA_KEY = 'PRACTICUM_TOKEN'
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+# Хранилище открывается при первом опросе, после check_tokens().
+VAULT = None
 
 HOMEWORK_STATUSES = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -35,6 +53,10 @@ HOMEWORK_STATUS = 'status'
 HOMEWORKS_KEY = 'homeworks'
 CURRENT_DATE_KEY = 'current_date'
 
+HOMEWORK_SCHEMA = HomeworkSchema(
+    HOMEWORK_STATUSES, HOMEWORKS_KEY, HOMEWORK_NAME, HOMEWORK_STATUS
+)
+
 LOG_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
 
 # Инициализация логгера
@@ -48,28 +70,53 @@ handler = StreamHandler(stream=sys.stdout)
 logger.addHandler(handler)
 
 
+@traced('send_message')
 def send_message(bot, message):
     """Функция отправляет сообщение юзеру в Telegram."""
-    msg = bot.send_message(TELEGRAM_CHAT_ID, message)
+    msg = bot.send_message(TELEGRAM_CHAT_ID, message, timeout=TELEGRAM_TIMEOUT)
     if not msg:
         error_msg = 'Сообщение не было отправлено'
         raise SendMessageError(error_msg)
+    if RECORDER is not None:
+        RECORDER.telegram(message)
 
 
+def practicum_headers():
+    """
+    Функция возвращает заголовки авторизации для API Практикума.
+    Если задан PRACTICUM_TOKEN_ID, токен берется из хранилища токенов.
+    """
+    global VAULT
+    if not PRACTICUM_TOKEN_ID:
+        return HEADERS
+    if VAULT is None:
+        VAULT = TokenVault(keys=VAULT_KEYS)
+    # Отзыв или замена токена в хранилище вступает в силу без перезапуска.
+    VAULT.refresh_if_changed()
+    return VAULT.headers(PRACTICUM_TOKEN_ID)
+
+
+@traced('get_api_answer')
 def get_api_answer(current_timestamp):
     """
     Функиця делает запрос к API Практикум.Домашка.
     Возвращает дату в формате dict.
     """
-    timestamp = current_timestamp or int(time.time())
+    timestamp = current_timestamp or int(current_time())
     params = {'from_date': timestamp}
+    headers = practicum_headers()
 
     try:
-        response = requests.get(ENDPOINT, headers=HEADERS, params=params)
-    except Exception:
+        response = fetch(
+            ENDPOINT, headers, params, quota_key=QUOTA_KEY, shutdown=SHUTDOWN
+        )
+    except Exception as error:
+        # Подробности сбоя только в логе: текст ошибки requests может
+        # меняться от опроса к опросу, а сообщение в Telegram должно
+        # совпадать, чтобы повтор не отправлялся.
         msg = ('Сервер недоступен. Проверьте правильность'
                f' эндпоинта [{ENDPOINT}].')
-        logger.error(msg)
+        logger.error(f'{msg} {error}')
         raise ConnectionError(msg)
 
     api_response = response.json()
@@ -89,6 +136,7 @@ def get_api_answer(current_timestamp):
     return api_response
 
 
+@traced('check_response')
 def check_response(response):
     """
     Функция проверяет ответ API на корректность.
@@ -100,17 +148,7 @@ def check_response(response):
                ' константа "RETRY_TIME".')
         raise InvalidResponse(msg)
 
-    if HOMEWORKS_KEY not in response:
-        msg = f'Отсутствует ожидаемый ключ "{HOMEWORKS_KEY}" в ответе API.'
-        raise TypeError(msg)
-
-    homeworks = response['homeworks']
-    homeworks_type = type(homeworks)
-
-    if not isinstance(homeworks, list):
-        msg = (f'Полученный тип данных "{homeworks_type}" в ответе API'
-               ' не соответствует ожидаемому типу данных "list".')
-        raise TypeError(msg)
+    homeworks = HOMEWORK_SCHEMA.validate_envelope(response)
 
     if homeworks:
         return homeworks[0]
@@ -120,6 +158,7 @@ def check_response(response):
         raise EmptyHomeworksDict(msg)
 
 
+@traced('parse_status')
 def parse_status(homework):
     """
     Функиця извлекает из конкретной домашней работы информацию для отправки.
@@ -129,25 +168,11 @@ def parse_status(homework):
     if not homework:
         return 'Сегодня домашняя работа не отправлялась. Жду обновлений...'
 
-    if HOMEWORK_NAME not in homework:
-        msg = f'Отсутствует ожидаемый ключ "{HOMEWORK_NAME}" в ответе API.'
-        raise KeyError(msg)
-
-    elif HOMEWORK_STATUS not in homework:
-        msg = (f'Отсутствует ожидаемый ключ "{HOMEWORK_STATUS}" '
-               'в ответе API.')
-        raise KeyError(msg)
-
-    else:
-        homework_name = homework.get(HOMEWORK_NAME)
-        homework_status = homework.get(HOMEWORK_STATUS)
-
-    if homework_status not in HOMEWORK_STATUSES:
-        msg = ('Недокументированный статус домашней работы'
-               f' "{homework_status}", обнаруженный в ответе API.')
-        raise KeyError(msg)
+    homework_name, homework_status = HOMEWORK_SCHEMA.validate_homework(
+        homework
+    )
 
-    verdict = HOMEWORK_STATUSES.get(homework_status)
+    verdict = HOMEWORK_STATUSES[homework_status]
     return (f'Изменился статус проверки работы "{homework_name}".'
             f' {verdict}')
 
@@ -158,10 +183,11 @@ def check_tokens():
     В случае отсутствия одного из токенов, функция возвращает False,
     иначе True.
     """
-    if not PRACTICUM_TOKEN:
+    if not (PRACTICUM_TOKEN or PRACTICUM_TOKEN_ID):
         logger.critical(
             ('Отсутствует обязательная переменная окружения:'
-             ' "PRACTICUM_TOKEN". Программа принудительно остановлена.')
+             ' "PRACTICUM_TOKEN" (или "PRACTICUM_TOKEN_ID").'
+             ' Программа принудительно остановлена.')
         )
         return False
     elif not TELEGRAM_TOKEN:
@@ -177,8 +203,61 @@ def check_tokens():
              ' "TELEGRAM_CHAT_ID". Программа принудительно остановлена.')
         )
         return False
-    else:
+    if PRACTICUM_TOKEN_ID:
+        try:
+            load_keys(VAULT_KEYS)
+        except VaultError as error:
+            logger.critical(
+                f'{error} Программа принудительно остановлена.'
+            )
+            return False
+    return True
+
+
+@traced('notify')
+def notify(outbox, bus, event):
+    """
+    Функция записывает уведомление в журнал и публикует событие на шине.
+    Отправка в Telegram идет в потоке журнала, поэтому в разбивке
+    медленного опроса виден этот этап, а не send_message.
+    Событие, уже записанное в журнал с тем же ключом, не публикуется:
+    история и остальные получатели не видят повторов.
+    """
+    if outbox.append(event.key, event.message, event.lane):
+        bus.publish(event)
+
+
+def log_lane_stats(outbox):
+    """Функция пишет в лог статистику очередей уведомлений."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f'Очереди уведомлений: {outbox.lane_stats()}')
+
+
+def save_state(state):
+    """Функция сохраняет состояние бота, не прерывая цикл опроса."""
+    try:
+        state.save()
+    except OSError as error:
+        logger.error(f'Не удалось сохранить состояние бота: {error}')
+
+
+def wait_next_poll(shutdown, seconds):
+    """
+    Функция ждет следующего опроса и свободного бюджета запросов к API.
+    Опрос откладывается, а не отправляется впустую.
+    Возвращает True, если за время ожидания запрошена остановка.
+    """
+    if shutdown.wait(seconds):
         return True
+    delay = RATE_LIMITER.reserve(QUOTA_KEY)
+    while delay:
+        logger.warning(
+            f'Опрос API отложен на {delay:.0f} с: исчерпан бюджет запросов.'
+        )
+        if shutdown.wait(delay):
+            return True
+        delay = RATE_LIMITER.reserve(QUOTA_KEY)
+    return False
 
 
 def main():
@@ -186,13 +265,38 @@ def main():
     if not check_tokens():
         exit()
 
+    shutdown = SHUTDOWN
+    shutdown.install()
+    install_profiler_trigger()
+
     bot = Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
+
+    # Курсор опроса переживает перезапуск: после деплоя бот продолжает
+    # с той же метки from_date и не опрашивает API раньше срока.
+    state = BotState.load(STATE_PATH)
+    current_timestamp = state.current_timestamp or int(current_time())
+
+    # Сообщения в Telegram сначала фиксируются в журнале и только
+    # потом доставляются, поэтому сбой отправки или падение процесса
+    # не теряют уведомление.
+    outbox = Outbox(OUTBOX_PATH, lambda message: send_message(bot, message))
+    outbox.start()
+
+    # Дополнительные приемники получают те же события через шину
+    # без повторного опроса API.
+    bus = EventBus()
+    history = StatusHistory(HISTORY_DIR)
+    bus.register(HistorySink(history))
+    for sink in sinks_from_env():
+        bus.register(sink)
 
     previous_telegram_message = None
     previous_error_message = None
 
-    while True:
+    wait_next_poll(shutdown, state.startup_delay())
+
+    while not shutdown.requested:
+        poll_started()
         try:
             response = get_api_answer(current_timestamp)
             homework = check_response(response)
@@ -200,7 +304,9 @@ def main():
 
             if message != previous_telegram_message:
                 previous_telegram_message = message
-                send_message(bot, message)
+                notify(
+                    outbox, bus, StatusChanged.from_homework(homework, message)
+                )
             else:
                 logger.debug('В ответе отсутствуют новые статусы.')
 
@@ -210,7 +316,7 @@ def main():
                 msg = f'Неверный тип данных {CURRENT_DATE_KEY}'
                 raise TypeError(msg)
 
-            time.sleep(RETRY_TIME)
+            state.current_timestamp = current_timestamp
 
         except Exception as error:
             message = f'Сбой в работе программы: {error}'
@@ -218,11 +324,25 @@ def main():
 
             if message != previous_error_message:
                 previous_error_message = message
-                send_message(bot, message)
-
-            time.sleep(RETRY_TIME)
+                notify(outbox, bus, ErrorOccurred(message))
         else:
             logger.debug('Бот работает без ошибок.')
+            log_lane_stats(outbox)
+
+        poll_finished()
+        state.next_poll_at = current_time() + RETRY_TIME
+        save_state(state)
+        wait_next_poll(shutdown, RETRY_TIME)
+
+    # Новые опросы больше не начинаются; за отведенное время
+    # досылаем накопленные уведомления и сохраняем состояние.
+    outbox.close(shutdown.remaining())
+    bus.close(shutdown.remaining())
+    history.close()
+    if RECORDER is not None:
+        RECORDER.close()
+    save_state(state)
+    logger.info('Бот остановлен.')
 
 
 if __name__ == '__main__':
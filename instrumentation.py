@@ -0,0 +1,194 @@
+from collections import Counter
+from functools import wraps
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+
+# Замеры этапов включаются переменной окружения BOT_TRACE=1.
+# В выключенном состоянии traced() возвращает исходную функцию,
+# а poll_started()/poll_finished() сводятся к проверке флага.
+TRACE_ENABLED = os.getenv('BOT_TRACE') == '1'
+SLOW_POLL = float(os.getenv('BOT_SLOW_POLL', 5))
+
+PROFILE_DIR = os.getenv('BOT_PROFILE_DIR', '.')
+PROFILE_SECONDS = float(os.getenv('BOT_PROFILE_SECONDS', 0))
+PROFILE_INTERVAL = 0.01
+PROFILE_DURATION = 30
+
+logger = logging.getLogger(__name__)
+
+
+class StageStats:
+    """Количество вызовов, суммарное и максимальное время этапа."""
+
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+_local = threading.local()
+
+
+def record(name, elapsed):
+    """Функция учитывает длительность этапа name в секундах."""
+    with _stats_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = StageStats()
+        stats.add(elapsed)
+    spans = getattr(_local, 'spans', None)
+    if spans is not None:
+        spans.append((name, elapsed))
+
+
+def traced(name):
+    """Декоратор: замер длительности этапа, если трассировка включена."""
+    def decorator(func):
+        if not TRACE_ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def poll_started():
+    """Функция отмечает начало итерации опроса в текущем потоке."""
+    if TRACE_ENABLED:
+        _local.spans = []
+        _local.started = time.perf_counter()
+
+
+def poll_finished():
+    """
+    Функция завершает итерацию опроса. Если итерация дольше SLOW_POLL
+    секунд, в лог пишется разбивка времени по этапам.
+    """
+    started = getattr(_local, 'started', None)
+    if not TRACE_ENABLED or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    _local.started = None
+    spans, _local.spans = _local.spans, None
+    record('poll', elapsed)
+    if elapsed >= SLOW_POLL:
+        breakdown = ', '.join(
+            f'{name} {span * 1000:.0f} мс' for name, span in spans
+        )
+        logger.warning(
+            f'Медленный опрос: {elapsed * 1000:.0f} мс ({breakdown}).'
+        )
+
+
+def report():
+    """Функция возвращает статистику этапов."""
+    with _stats_lock:
+        return {
+            name: {
+                'count': stats.count,
+                'total': stats.total,
+                'mean': stats.total / stats.count,
+                'max': stats.max,
+            }
+            for name, stats in _stats.items()
+        }
+
+
+class SamplingProfiler:
+    """
+    Выборочный профилировщик: с интервалом PROFILE_INTERVAL снимает
+    стеки всех потоков и сохраняет их в свернутом формате
+    (folded stacks), который понимают flamegraph.pl и speedscope.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, interval=PROFILE_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=PROFILE_DURATION):
+        """Функция запускает профилирование в фоновом потоке."""
+        if self.running:
+            logger.info('Профилирование уже выполняется.')
+            return False
+        self._thread = threading.Thread(
+            target=self._run, args=(duration,), name='profiler', daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, duration):
+        samples = Counter()
+        own_id = threading.get_ident()
+        finish_at = time.monotonic() + duration
+        while time.monotonic() < finish_at:
+            names = {
+                thread.ident: thread.name for thread in threading.enumerate()
+            }
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f'{code.co_name} '
+                        f'({os.path.basename(code.co_filename)}:'
+                        f'{code.co_firstlineno})'
+                    )
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                samples[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+        path = os.path.join(
+            self.directory, f'profile-{int(time.time())}.folded'
+        )
+        with open(path, 'w', encoding='utf-8') as stream:
+            for stack, count in samples.most_common():
+                stream.write(f'{stack} {count}\n')
+        logger.info(f'Профиль сохранен в {path}.')
+
+
+PROFILER = SamplingProfiler()
+
+
+def install_profiler_trigger(profiler=PROFILER):
+    """
+    Функция включает запуск профилирования по сигналу SIGUSR1 и,
+    если задана BOT_PROFILE_SECONDS, сразу при старте бота.
+    """
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(
+            signal.SIGUSR1, lambda signum, frame: profiler.start()
+        )
+    if PROFILE_SECONDS:
+        profiler.start(PROFILE_SECONDS)
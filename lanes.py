@@ -0,0 +1,124 @@
+from collections import deque
+import time
+
+
+LANE_VERDICT = 'verdict'
+LANE_STATUS = 'status'
+LANE_ERROR = 'error'
+
+VERDICT_STATUSES = ('approved', 'rejected')
+
+LATENCY_SAMPLES = 256
+
+
+class Lane:
+    """
+    Полоса доставки.
+    weight - доля полосы при взвешенном планировании;
+    max_pending - сколько сообщений хранить, лишние старые отбрасываются;
+    min_interval - минимальный интервал между отправками (секунды).
+    """
+
+    def __init__(self, name, weight, max_pending=None, min_interval=0):
+        self.name = name
+        self.weight = weight
+        self.max_pending = max_pending
+        self.min_interval = min_interval
+
+
+LANES = (
+    Lane(LANE_VERDICT, weight=8),
+    Lane(LANE_STATUS, weight=4),
+    Lane(LANE_ERROR, weight=2, max_pending=10, min_interval=30),
+)
+
+
+def lane_for_status(status):
+    """Функция определяет полосу уведомления о статусе работы."""
+    if status in VERDICT_STATUSES:
+        return LANE_VERDICT
+    return LANE_STATUS
+
+
+class LaneStats:
+    """Счетчики и задержка доставки по полосе."""
+
+    def __init__(self):
+        self.delivered = 0
+        self.shed = 0
+        self.max_latency = 0.0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, latency):
+        self.delivered += 1
+        self.max_latency = max(self.max_latency, latency)
+        self._latencies.append(latency)
+
+    def to_dict(self):
+        latencies = sorted(self._latencies)
+        p50 = latencies[len(latencies) // 2] if latencies else None
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else None
+        return {
+            'delivered': self.delivered,
+            'shed': self.shed,
+            'latency_p50': p50,
+            'latency_p95': p95,
+            'latency_max': self.max_latency,
+        }
+
+
+class WeightedScheduler:
+    """
+    Плавный взвешенный циклический выбор полосы (smooth weighted
+    round-robin): полосы с большим весом выбираются чаще, но полосы
+    с малым весом не простаивают бесконечно.
+    """
+
+    def __init__(self, lanes=LANES):
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.stats = {lane.name: LaneStats() for lane in lanes}
+        self._current = {lane.name: 0 for lane in lanes}
+        self._last_sent = {lane.name: 0.0 for lane in lanes}
+
+    def choose(self, pending, now=None):
+        """
+        Функция выбирает полосу для следующей отправки.
+        pending - словарь: имя полосы -> количество сообщений.
+        Возвращает (имя полосы, None) или (None, сколько ждать).
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        wait = None
+        for name, count in pending.items():
+            if not count:
+                continue
+            lane = self.lanes[name]
+            ready_at = self._last_sent[name] + lane.min_interval
+            if ready_at > now:
+                delay = ready_at - now
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            ready.append(lane)
+        if not ready:
+            return None, wait
+
+        total = 0
+        for lane in ready:
+            self._current[lane.name] += lane.weight
+            total += lane.weight
+        chosen = max(ready, key=lambda lane: self._current[lane.name])
+        self._current[chosen.name] -= total
+        return chosen.name, None
+
+    def delivered(self, name, created_at, now=None):
+        """Функция учитывает доставку сообщения полосы."""
+        self._last_sent[name] = time.monotonic() if now is None else now
+        self.stats[name].record(max(0.0, time.time() - created_at))
+
+    def shed(self, name):
+        """Функция учитывает отброшенное сообщение полосы."""
+        self.stats[name].shed += 1
+
+    def report(self):
+        """Функция возвращает статистику по полосам."""
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
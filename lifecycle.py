@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import random
+import signal
+import threading
+
+from clock import current_monotonic, current_time, wait_event
+
+
+STATE_PATH = os.getenv('STATE_PATH', 'bot_state.json')
+
+# Heroku ждет 30 секунд после SIGTERM, затем присылает SIGKILL.
+SHUTDOWN_TIMEOUT = 25
+STARTUP_JITTER = 30
+
+logger = logging.getLogger(__name__)
+
+
+class GracefulShutdown:
+    """
+    Координация остановки бота по SIGTERM/SIGINT.
+    Обработчик сигнала только выставляет флаг: цикл опроса завершает
+    текущую итерацию и больше не начинает новых опросов, а ожидание
+    между опросами прерывается сразу.
+    """
+
+    def __init__(self, timeout=SHUTDOWN_TIMEOUT):
+        self.timeout = timeout
+        self._requested = threading.Event()
+        self._deadline = None
+
+    @property
+    def requested(self):
+        return self._requested.is_set()
+
+    def install(self, signals=(signal.SIGTERM, signal.SIGINT)):
+        """Функция устанавливает обработчики сигналов остановки."""
+        for signum in signals:
+            signal.signal(signum, self._handle)
+
+    def request(self):
+        """Функция запрашивает остановку и запускает отсчет срока."""
+        if self._deadline is None:
+            self._deadline = current_monotonic() + self.timeout
+        self._requested.set()
+
+    def wait(self, seconds):
+        """
+        Функция ждет заданное время.
+        Возвращает True, если за это время запрошена остановка.
+        """
+        return wait_event(self._requested, seconds)
+
+    def remaining(self):
+        """Функция возвращает, сколько секунд осталось до срока остановки."""
+        if self._deadline is None:
+            return self.timeout
+        return max(0.0, self._deadline - current_monotonic())
+
+    def _handle(self, signum, frame):
+        logger.info(
+            f'Получен сигнал {signal.Signals(signum).name},'
+            ' бот завершает работу.'
+        )
+        self.request()
+
+
+SHUTDOWN = GracefulShutdown()
+
+
+class BotState:
+    """
+    Курсор опроса, сохраняемый между перезапусками: метка from_date
+    и время следующего опроса. Файл заменяется атомарно.
+    """
+
+    def __init__(self, path=STATE_PATH, current_timestamp=None,
+                 next_poll_at=None):
+        self.path = path
+        self.current_timestamp = current_timestamp
+        self.next_poll_at = next_poll_at
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        """Функция читает состояние; при отсутствии файла - пустое."""
+        try:
+            with open(path, encoding='utf-8') as stream:
+                data = json.load(stream)
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, ValueError) as error:
+            logger.error(f'Не удалось прочитать состояние {path}: {error}')
+            return cls(path)
+        return cls(
+            path, data.get('current_timestamp'), data.get('next_poll_at')
+        )
+
+    def save(self):
+        """Функция атомарно сохраняет состояние на диск."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as stream:
+            json.dump({
+                'current_timestamp': self.current_timestamp,
+                'next_poll_at': self.next_poll_at,
+            }, stream)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(tmp_path, self.path)
+
+    def startup_delay(self, now=None, jitter=STARTUP_JITTER):
+        """
+        Функция возвращает задержку первого опроса после запуска.
+        Если запланированный опрос еще не наступил, ждем его; иначе
+        добавляем случайную задержку, чтобы перезапущенные процессы
+        не опрашивали API одновременно.
+        """
+        now = current_time() if now is None else now
+        if self.next_poll_at is not None and self.next_poll_at > now:
+            return self.next_poll_at - now
+        return random.uniform(0, jitter)
@@ -0,0 +1,334 @@
+from collections import OrderedDict
+from itertools import chain
+import json
+import logging
+import os
+import threading
+import time
+
+from exceptions import OutboxError
+from lanes import LANE_STATUS, WeightedScheduler
+
+
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', 'outbox.jsonl')
+
+COMPACT_THRESHOLD = 10000
+DONE_KEYS_LIMIT = 100000
+MAX_BACKOFF = 60
+# После стольких неудачных попыток сообщение снимается с доставки.
+MAX_ATTEMPTS = 8
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Журнал упреждающей записи для уведомлений в Telegram.
+
+    Сообщение сначала дописывается в журнал и сбрасывается на диск,
+    затем доставляется рабочим потоком и подтверждается записью ack.
+    Ключ идемпотентности (работа, статус и время его изменения) не дает
+    поставить одно и то же уведомление дважды, в том числе после
+    перезапуска.
+    Повторная отправка возможна только при падении процесса между
+    отправкой в Telegram и записью подтверждения.
+
+    Групповая фиксация: пока один поток выполняет fsync, остальные
+    дописывают записи в буфер и фиксируются следующим общим fsync.
+
+    Сообщения разложены по полосам (lanes.py): вердикты ревьюера
+    доставляются раньше сообщений об ошибках, а ошибки при переполнении
+    полосы отбрасываются и отправляются не чаще заданного интервала.
+    """
+
+    def __init__(self, path, deliver, compact_threshold=COMPACT_THRESHOLD,
+                 scheduler=None):
+        self.path = path
+        self.deliver = deliver
+        self.compact_threshold = compact_threshold
+        self.scheduler = scheduler or WeightedScheduler()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._has_work = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._pending = {name: OrderedDict() for name in self.scheduler.lanes}
+        self._lane_of = {}
+        # Записанные, но еще не зафиксированные fsync'ом сообщения:
+        # рабочему потоку они не видны, но компактизация их сохраняет.
+        self._unsynced = {}
+        self._done = OrderedDict()
+        self._attempts = {}
+        self._keys = set()
+        self._written = 0
+        self._durable = 0
+        self._since_compact = 0
+        self._stopping = False
+        self._closed = False
+        self._thread = None
+        self._file = open(path, 'a', encoding='utf-8')
+        self._replay()
+
+    def __len__(self):
+        return len(self._lane_of)
+
+    def start(self):
+        """Функция запускает поток доставки сообщений."""
+        self._thread = threading.Thread(
+            target=self._run, name='outbox', daemon=True
+        )
+        self._thread.start()
+
+    def append(self, key, message, lane=LANE_STATUS):
+        """
+        Функция записывает сообщение в журнал и ставит его на доставку
+        в указанную полосу.
+        Возвращает False, если сообщение с таким ключом уже было.
+        """
+        if lane not in self._pending:
+            raise OutboxError(f'Неизвестная полоса доставки "{lane}".')
+        created_at = time.time()
+        with self._lock:
+            if self._closed:
+                raise OutboxError('Журнал уведомлений закрыт.')
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            seq = self._write({
+                'op': 'add', 'key': key, 'message': message,
+                'lane': lane, 'created_at': created_at,
+            })
+            self._unsynced[key] = (message, lane, created_at)
+        self._sync(seq)
+        with self._lock:
+            # Сообщение доступно рабочему потоку только после fsync.
+            del self._unsynced[key]
+            self._enqueue(key, message, lane, created_at)
+            self._has_work.notify()
+        return True
+
+    def ack(self, key, error=None):
+        """
+        Функция подтверждает доставку сообщения.
+        С error сообщение снимается с доставки как недоставляемое.
+        """
+        record = {'op': 'ack', 'key': key}
+        if error is not None:
+            record['error'] = error
+        with self._lock:
+            # После закрытия журнал не меняется: недоставленное сообщение
+            # остается в очереди и в журнале до следующего запуска.
+            if self._closed:
+                return
+            lane = self._lane_of.pop(key, None)
+            if lane is None:
+                return
+            seq = self._write(record)
+            del self._pending[lane][key]
+            self._mark_done(key)
+        self._sync(seq)
+        # Журнал переписывается, когда новых записей стало больше, чем
+        # живых: так стоимость компактизации делится на все записи,
+        # даже если ключей доставленных сообщений больше порога.
+        live = len(self._done) + len(self._lane_of)
+        if self._since_compact > max(self.compact_threshold, live):
+            self.compact()
+
+    def compact(self):
+        """
+        Функция переписывает журнал: остаются недоставленные сообщения
+        и ключи последних доставленных (для идемпотентности).
+        """
+        with self._sync_lock, self._lock:
+            if self._closed:
+                return
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as stream:
+                for key in self._done:
+                    stream.write(json.dumps({'op': 'ack', 'key': key}) + '\n')
+                unsynced = (
+                    (key, message, lane, created_at)
+                    for key, (message, lane, created_at)
+                    in self._unsynced.items()
+                )
+                pending = (
+                    (key, message, lane, created_at)
+                    for lane, messages in self._pending.items()
+                    for key, (message, created_at) in messages.items()
+                )
+                for key, message, lane, created_at in chain(
+                    pending, unsynced
+                ):
+                    stream.write(json.dumps({
+                        'op': 'add', 'key': key, 'message': message,
+                        'lane': lane, 'created_at': created_at,
+                    }, ensure_ascii=False) + '\n')
+                stream.flush()
+                os.fsync(stream.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._since_compact = 0
+            self._durable = self._written
+
+    def lane_stats(self):
+        """Функция возвращает очередь, доставку и задержку по полосам."""
+        with self._lock:
+            report = self.scheduler.report()
+            for lane, pending in self._pending.items():
+                report[lane]['queued'] = len(pending)
+        return report
+
+    def close(self, timeout=None):
+        """
+        Функция останавливает доставку. Если задан timeout, поток
+        доставки до этого срока отправляет накопленные сообщения;
+        недоставленные останутся в журнале до следующего запуска.
+        """
+        with self._lock:
+            self._stopping = True
+            self._has_work.notify_all()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._sync_lock, self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._written += 1
+        self._since_compact += 1
+        return self._written
+
+    def _sync(self, seq):
+        if self._durable >= seq:
+            return
+        with self._sync_lock:
+            # Запись могла зафиксироваться fsync'ом другого потока.
+            if self._durable >= seq:
+                return
+            with self._lock:
+                if self._closed:
+                    return
+                self._file.flush()
+                target = self._written
+                fileno = self._file.fileno()
+            os.fsync(fileno)
+            self._durable = target
+
+    def _enqueue(self, key, message, lane, created_at):
+        pending = self._pending[lane]
+        pending[key] = (message, created_at)
+        self._lane_of[key] = lane
+        max_pending = self.scheduler.lanes[lane].max_pending
+        while max_pending is not None and len(pending) > max_pending:
+            # Самое старое сообщение полосы отбрасывается и больше
+            # не доставляется, в том числе после перезапуска.
+            old_key, _ = pending.popitem(last=False)
+            del self._lane_of[old_key]
+            self._write({'op': 'ack', 'key': old_key, 'shed': True})
+            self._mark_done(old_key)
+            self.scheduler.shed(lane)
+
+    def _mark_done(self, key):
+        self._done[key] = None
+        if len(self._done) > DONE_KEYS_LIMIT:
+            old_key, _ = self._done.popitem(last=False)
+            self._keys.discard(old_key)
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        complete = 0
+        with open(self.path, 'rb') as stream:
+            for line in stream:
+                if not line.endswith(b'\n'):
+                    # Недописанная последняя строка после падения процесса:
+                    # обрезаем ее, иначе следующая запись приклеится к ней.
+                    logger.warning(
+                        f'Обрезана недописанная запись журнала {self.path}.'
+                    )
+                    os.truncate(self.path, complete)
+                    break
+                complete += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(
+                        f'Пропущена поврежденная запись журнала {self.path}.'
+                    )
+                    continue
+                key = record['key']
+                self._keys.add(key)
+                self._since_compact += 1
+                if record['op'] == 'add':
+                    lane = record.get('lane', LANE_STATUS)
+                    if lane not in self._pending:
+                        lane = LANE_STATUS
+                    self._enqueue(
+                        key, record['message'], lane,
+                        record.get('created_at', time.time())
+                    )
+                else:
+                    lane = self._lane_of.pop(key, None)
+                    if lane is not None:
+                        del self._pending[lane][key]
+                    self._mark_done(key)
+        if self._lane_of:
+            logger.info(
+                f'В журнале {self.path} недоставленных сообщений:'
+                f' {len(self._lane_of)}.'
+            )
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._lock:
+                while True:
+                    if self._closed:
+                        # close() не дождался доставки: сообщение уже не
+                        # подтвердить, и повторять его нельзя.
+                        return
+                    counts = {
+                        lane: len(pending)
+                        for lane, pending in self._pending.items()
+                    }
+                    lane, wait = self.scheduler.choose(counts)
+                    if lane is not None:
+                        break
+                    if self._stopping:
+                        # Оставшиеся (придержанные) сообщения дождутся
+                        # следующего запуска в журнале.
+                        return
+                    self._has_work.wait(wait)
+                key, (message, created_at) = next(
+                    iter(self._pending[lane].items())
+                )
+            try:
+                self.deliver(message)
+            except Exception as error:
+                failures += 1
+                logger.error(f'Сбой доставки сообщения из журнала: {error}')
+                attempts = self._attempts.get(key, 0) + 1
+                self._attempts[key] = attempts
+                if attempts >= MAX_ATTEMPTS:
+                    # Сообщение, которое не принимает Telegram (например,
+                    # ошибка 400), не должно навсегда занимать голову полосы.
+                    logger.error(
+                        f'Сообщение {key} не доставлено за {attempts}'
+                        ' попыток и снято с доставки.'
+                    )
+                    del self._attempts[key]
+                    self.ack(key, error=str(error))
+                if self._stopping:
+                    return
+                self._wakeup.wait(min(2 ** failures, MAX_BACKOFF))
+                continue
+            failures = 0
+            self._attempts.pop(key, None)
+            self.scheduler.delivered(lane, created_at)
+            self.ack(key)
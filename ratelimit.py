@@ -0,0 +1,150 @@
+from collections import Counter
+import logging
+import threading
+
+from clock import current_monotonic, current_time
+
+
+# Глобальный бюджет: не больше 5 запросов в секунду, всплеск до 10.
+GLOBAL_PERIOD = 0.2
+GLOBAL_BURST = 10
+# Бюджет токена: один запрос в минуту, всплеск до 5 (повторы опроса).
+TOKEN_PERIOD = 60
+TOKEN_BURST = 5
+# Пауза после ответа 429 без заголовка Retry-After.
+THROTTLED_BACKOFF = 60
+
+LEDGER_RETENTION_HOURS = 48
+HOUR = 60 * 60
+GLOBAL_KEY = '*'
+
+logger = logging.getLogger(__name__)
+
+
+class GCRA:
+    """
+    Generic Cell Rate Algorithm: на каждый ключ хранится только
+    теоретическое время прихода (TAT) следующего запроса.
+    period - интервал между запросами, burst - допустимый всплеск.
+    """
+
+    def __init__(self, period, burst):
+        self.period = period
+        self.tolerance = period * (burst - 1)
+        self._tat = {}
+
+    def delay(self, key, now):
+        """Функция возвращает, сколько ждать до разрешения запроса."""
+        tat = max(self._tat.get(key, now), now)
+        return max(0.0, tat - self.tolerance - now)
+
+    def consume(self, key, now):
+        """Функция учитывает выполненный запрос."""
+        tat = max(self._tat.get(key, now), now)
+        self._tat[key] = tat + self.period
+
+    def block_until(self, key, moment):
+        """Функция запрещает запросы по ключу до указанного времени."""
+        self._tat[key] = max(
+            self._tat.get(key, moment), moment + self.tolerance
+        )
+
+    def prune(self, now):
+        """Функция удаляет ключи, бюджет которых полностью восстановлен."""
+        for key in [key for key, tat in self._tat.items() if tat <= now]:
+            del self._tat[key]
+
+
+class RateLimiter:
+    """Ограничитель запросов к API: общий бюджет и бюджет каждого токена."""
+
+    def __init__(self, global_period=GLOBAL_PERIOD, global_burst=GLOBAL_BURST,
+                 token_period=TOKEN_PERIOD, token_burst=TOKEN_BURST):
+        self._lock = threading.Lock()
+        self._global = GCRA(global_period, global_burst)
+        self._tokens = GCRA(token_period, token_burst)
+        self._reserved = 0
+
+    def reserve(self, key, now=None):
+        """
+        Функция резервирует запрос для токена.
+        Возвращает 0, если запрос можно отправлять сейчас, иначе
+        сколько секунд отложить опрос (бюджет при этом не расходуется).
+        """
+        now = current_monotonic() if now is None else now
+        with self._lock:
+            delay = max(
+                self._global.delay(GLOBAL_KEY, now),
+                self._tokens.delay(key, now),
+            )
+            if delay:
+                return delay
+            self._global.consume(GLOBAL_KEY, now)
+            self._tokens.consume(key, now)
+            self._reserved += 1
+            if self._reserved % 10000 == 0:
+                self._tokens.prune(now)
+            return 0.0
+
+    def throttled(self, key, retry_after=THROTTLED_BACKOFF, now=None):
+        """Функция откладывает запросы токена после ответа 429."""
+        now = current_monotonic() if now is None else now
+        with self._lock:
+            self._tokens.block_until(key, now + retry_after)
+
+
+class QuotaLedger:
+    """
+    Учет запросов к API по токенам и часам.
+    При смене часа итог завершившегося часа пишется в лог.
+    """
+
+    def __init__(self, retention_hours=LEDGER_RETENTION_HOURS):
+        self.retention_hours = retention_hours
+        self._lock = threading.Lock()
+        self._hours = {}
+        self._current_hour = None
+
+    def record(self, key, now=None, rejected=False):
+        """Функция учитывает запрос токена (rejected - ответ 429)."""
+        hour = int((current_time() if now is None else now) // HOUR)
+        with self._lock:
+            if hour != self._current_hour:
+                self._close_hour(hour)
+            calls, rejections = self._hours.setdefault(
+                hour, (Counter(), Counter())
+            )
+            calls[key] += 1
+            if rejected:
+                rejections[key] += 1
+
+    def report(self):
+        """
+        Функция возвращает учет по часам:
+        {начало часа (unix time): {токен: {'calls': .., 'rejected': ..}}}.
+        """
+        with self._lock:
+            return {
+                hour * HOUR: {
+                    key: {'calls': count, 'rejected': rejections[key]}
+                    for key, count in calls.items()
+                }
+                for hour, (calls, rejections) in sorted(self._hours.items())
+            }
+
+    def _close_hour(self, hour):
+        if self._current_hour in self._hours:
+            calls, rejections = self._hours[self._current_hour]
+            logger.info(
+                f'Запросов к API за час: {sum(calls.values())},'
+                f' отклонено: {sum(rejections.values())},'
+                f' токенов: {len(calls)}.'
+            )
+        self._current_hour = hour
+        for old_hour in [old_hour for old_hour in self._hours
+                         if old_hour <= hour - self.retention_hours]:
+            del self._hours[old_hour]
+
+
+RATE_LIMITER = RateLimiter()
+QUOTA_LEDGER = QuotaLedger()
@@ -0,0 +1,108 @@
+import gzip
+import json
+import logging
+import os
+import threading
+
+from clock import current_time
+
+
+# Запись трафика бота включается переменной окружения BOT_RECORD:
+# путь к архиву, который затем проигрывается replay.py.
+BOT_RECORD = os.getenv('BOT_RECORD')
+
+KIND_HTTP = 'http'
+KIND_TELEGRAM = 'telegram'
+
+logger = logging.getLogger(__name__)
+
+
+class Recorder:
+    """
+    Запись ответов API, неудачных попыток запроса и отправленных
+    в Telegram сообщений в архив: gzip-сжатые JSON Lines, по одной
+    записи на строку.
+    Каждая запись сбрасывается на диск сразу, поэтому архив читается
+    даже после аварийного завершения процесса.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stream = None
+
+    def http(self, params, response, elapsed):
+        """Функция записывает ответ API и время его получения."""
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        retry_after = response.headers.get('Retry-After')
+        record = {
+            'kind': KIND_HTTP,
+            'at': current_time(),
+            'params': params,
+            'status': response.status_code,
+            'body': body,
+            'elapsed': round(elapsed, 4),
+        }
+        if retry_after is not None:
+            record['retry_after'] = retry_after
+        self._write(record)
+
+    def failure(self, params, error, elapsed):
+        """Функция записывает неудачную попытку запроса к API."""
+        self._write({
+            'kind': KIND_HTTP,
+            'at': current_time(),
+            'params': params,
+            'error': type(error).__name__,
+            'message': str(error),
+            'elapsed': round(elapsed, 4),
+        })
+
+    def telegram(self, text):
+        """Функция записывает сообщение, отправленное в Telegram."""
+        self._write(
+            {'kind': KIND_TELEGRAM, 'at': current_time(), 'text': text}
+        )
+
+    def close(self):
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            try:
+                if self._stream is None:
+                    # Дозапись в gzip создает новый член архива,
+                    # gzip.open читает такие файлы целиком.
+                    self._stream = gzip.open(
+                        self.path, 'at', encoding='utf-8'
+                    )
+                self._stream.write(line + '\n')
+                self._stream.flush()
+            except OSError as error:
+                logger.error(
+                    f'Не удалось записать трафик в {self.path}: {error}'
+                )
+
+
+def read_archive(path):
+    """
+    Функция читает записи архива в порядке записи.
+    Оборванный при аварийном завершении хвост архива пропускается.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as stream:
+        try:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+        except EOFError:
+            logger.warning(f'Архив {path} оборван, хвост пропущен.')
+
+
+RECORDER = Recorder(BOT_RECORD) if BOT_RECORD else None
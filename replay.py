@@ -0,0 +1,236 @@
+import argparse
+from contextlib import ExitStack, contextmanager
+import json
+import logging
+import os
+import tempfile
+import time
+
+import requests
+
+from clock import VirtualClock, use_clock
+import exceptions
+from exceptions import ReplayError
+import homework
+from lanes import LANES, Lane, WeightedScheduler
+from lifecycle import BotState, GracefulShutdown
+from outbox import Outbox
+from ratelimit import QuotaLedger, RateLimiter
+from recorder import KIND_HTTP, KIND_TELEGRAM, read_archive
+import upstream
+
+# При воспроизведении придержка сообщений об ошибках выключена:
+# поток доставки живет в реальном времени, а опросы - в виртуальном,
+# и иначе часть сообщений не успевала бы уйти до остановки.
+REPLAY_LANES = tuple(
+    Lane(lane.name, lane.weight, lane.max_pending) for lane in LANES
+)
+
+
+class ReplayResponse:
+    """Записанный ответ API с интерфейсом requests.Response."""
+
+    def __init__(self, record):
+        self.status_code = record['status']
+        self.headers = {}
+        if 'retry_after' in record:
+            self.headers['Retry-After'] = record['retry_after']
+        self._body = record['body']
+
+    def json(self):
+        if self._body is None:
+            raise ValueError('Ответ API не является JSON.')
+        return self._body
+
+
+class ReplayBot:
+    """Бот Telegram, который только запоминает отправленные сообщения."""
+
+    def __init__(self, token=None):
+        self.sent = []
+
+    def send_message(self, chat_id, text, timeout=None):
+        self.sent.append(text)
+        return {'chat_id': chat_id, 'text': text}
+
+
+class ReplayShutdown(GracefulShutdown):
+    """Остановка без обработчиков сигналов процесса."""
+
+    def install(self, signals=()):
+        pass
+
+
+class ReplayState(BotState):
+    """Состояние без случайной задержки первого опроса."""
+
+    def startup_delay(self, now=None, jitter=0):
+        return 0.0
+
+
+class Replayer:
+    """
+    Воспроизведение архива, записанного с BOT_RECORD, через полный
+    цикл homework.main(): ответы API отдаются из архива по очереди,
+    ожидания планировщика идут по виртуальным часам, а отправленные
+    сообщения сравниваются с записанными.
+    """
+
+    def __init__(self, path):
+        records = list(read_archive(path))
+        self.responses = [
+            record for record in records if record['kind'] == KIND_HTTP
+        ]
+        self.expected = [
+            record['text'] for record in records
+            if record['kind'] == KIND_TELEGRAM
+        ]
+        start = self.responses[0]['at'] if self.responses else 0.0
+        self.clock = VirtualClock(start)
+        self.bot = None
+        self.outbox = None
+        self.shutdown = ReplayShutdown()
+        if not self.responses:
+            self.shutdown.request()
+        self.served = 0
+        self.cursor_divergence = 0
+
+    def run(self, workdir=None):
+        """Функция воспроизводит архив и возвращает отчет."""
+        with ExitStack() as stack:
+            if workdir is None:
+                workdir = stack.enter_context(tempfile.TemporaryDirectory())
+            os.makedirs(workdir, exist_ok=True)
+            ledger = QuotaLedger()
+            limiter = RateLimiter()
+            for module, name, value in (
+                (requests, 'get', self._get),
+                (homework, 'Bot', self._make_bot),
+                (homework, 'Outbox', self._make_outbox),
+                (homework, 'SHUTDOWN', self.shutdown),
+                (homework, 'BotState', ReplayState),
+                (homework, 'install_profiler_trigger', lambda: None),
+                (homework, 'sinks_from_env', lambda: []),
+                (homework, 'RECORDER', None),
+                (homework, 'RATE_LIMITER', limiter),
+                (homework, 'STATE_PATH', os.path.join(workdir, 'state.json')),
+                (homework, 'OUTBOX_PATH',
+                 os.path.join(workdir, 'outbox.jsonl')),
+                (homework, 'HISTORY_DIR', os.path.join(workdir, 'history')),
+                (homework, 'PRACTICUM_TOKEN', 'replay'),
+                (homework, 'PRACTICUM_TOKEN_ID', None),
+                (homework, 'VAULT', None),
+                (homework, 'TELEGRAM_TOKEN', 'replay'),
+                (homework, 'TELEGRAM_CHAT_ID', 'replay'),
+                (upstream, 'RECORDER', None),
+                (upstream, 'RATE_LIMITER', limiter),
+                (upstream, 'QUOTA_LEDGER', ledger),
+                (upstream, 'HEDGE_AFTER', None),
+            ):
+                stack.enter_context(_patched(module, name, value))
+            stack.enter_context(use_clock(self.clock))
+
+            started_at = self.clock.time()
+            wall_started = time.perf_counter()
+            homework.main()
+            wall = time.perf_counter() - wall_started
+            virtual = self.clock.time() - started_at
+
+        sent = self.bot.sent if self.bot is not None else []
+        mismatches = sum(
+            1 for got, want in zip(sent, self.expected) if got != want
+        ) + abs(len(sent) - len(self.expected))
+        return {
+            'polls': self.served,
+            'telegram_sent': len(sent),
+            'telegram_expected': len(self.expected),
+            'telegram_mismatches': mismatches,
+            'cursor_divergence': self.cursor_divergence,
+            'virtual_seconds': virtual,
+            'wall_seconds': wall,
+            'polls_per_second': self.served / wall if wall else None,
+            'speedup': virtual / wall if wall else None,
+            'lanes': (
+                self.outbox.lane_stats() if self.outbox is not None else {}
+            ),
+            'quota': ledger.report(),
+        }
+
+    def _get(self, url, headers=None, params=None, timeout=None):
+        if self.served >= len(self.responses):
+            raise ReplayError('Записанные ответы API закончились.')
+        record = self.responses[self.served]
+        self.served += 1
+        if params != record['params']:
+            self.cursor_divergence += 1
+        self.clock.advance(record['elapsed'])
+        if self.served == len(self.responses):
+            # Последний ответ: текущая итерация опроса завершится,
+            # а следующей уже не будет.
+            self.shutdown.request()
+        if 'error' in record:
+            raise replay_error(record)
+        return ReplayResponse(record)
+
+    def _make_bot(self, token=None):
+        self.bot = ReplayBot(token)
+        return self.bot
+
+    def _make_outbox(self, path, deliver):
+        self.outbox = Outbox(
+            path, deliver, scheduler=WeightedScheduler(REPLAY_LANES)
+        )
+        return self.outbox
+
+
+def replay_error(record):
+    """
+    Функция восстанавливает записанный сбой запроса: исключение requests
+    (таймауты, ошибки соединения) или исключение бота с тем же именем.
+    """
+    name = record['error']
+    error_class = getattr(
+        requests.exceptions, name, getattr(exceptions, name, None)
+    )
+    if not (isinstance(error_class, type)
+            and issubclass(error_class, Exception)):
+        error_class = ReplayError
+    return error_class(record['message'])
+
+
+@contextmanager
+def _patched(module, name, value):
+    previous = getattr(module, name)
+    setattr(module, name, value)
+    try:
+        yield value
+    finally:
+        setattr(module, name, previous)
+
+
+def replay(path, workdir=None):
+    """Функция воспроизводит архив path и возвращает отчет."""
+    return Replayer(path).run(workdir)
+
+
+def main(argv=None):
+    """Воспроизведение архива из командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Воспроизведение записанного трафика бота.'
+    )
+    parser.add_argument('archive', help='архив, записанный с BOT_RECORD')
+    parser.add_argument(
+        '--workdir',
+        help='каталог для журнала, истории и состояния (по умолчанию'
+             ' временный)'
+    )
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    report = replay(args.archive, args.workdir)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if report['telegram_mismatches'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
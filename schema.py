@@ -0,0 +1,94 @@
+from operator import itemgetter
+
+
+_get_status = itemgetter(1)
+
+
+class HomeworkSchema:
+    """
+    Скомпилированная схема ответа homework_statuses.
+
+    Ключи и допустимые статусы подготавливаются один раз при создании
+    схемы. На успешном пути запись проверяется одним вызовом itemgetter
+    и одной проверкой вхождения во frozenset; тексты ошибок строятся
+    только при сбое. Типы исключений и тексты совпадают с проверками
+    check_response() и parse_status().
+    """
+
+    def __init__(self, statuses, homeworks_key='homeworks',
+                 name_key='homework_name', status_key='status'):
+        self.homeworks_key = homeworks_key
+        self.name_key = name_key
+        self.status_key = status_key
+        self.statuses = frozenset(statuses)
+        self._get_fields = itemgetter(name_key, status_key)
+
+    def validate_envelope(self, response):
+        """
+        Функция проверяет ответ API верхнего уровня.
+        Возвращает список домашних работ без проверки самих работ.
+        """
+        try:
+            homeworks = response[self.homeworks_key]
+        except (KeyError, TypeError, IndexError):
+            raise TypeError(
+                f'Отсутствует ожидаемый ключ "{self.homeworks_key}"'
+                ' в ответе API.'
+            )
+        if not isinstance(homeworks, list):
+            raise TypeError(
+                f'Полученный тип данных "{type(homeworks)}" в ответе API'
+                ' не соответствует ожидаемому типу данных "list".'
+            )
+        return homeworks
+
+    def validate_homework(self, homework):
+        """
+        Функция проверяет одну домашнюю работу.
+        Возвращает кортеж (название работы, статус).
+        """
+        try:
+            name, status = self._get_fields(homework)
+        except (KeyError, TypeError, IndexError):
+            self._raise_missing_key(homework)
+        if status not in self.statuses:
+            self._raise_unknown_status(status)
+        return name, status
+
+    def validate(self, response):
+        """
+        Функция проверяет ответ API целиком за один проход.
+        Возвращает список кортежей (название работы, статус).
+        Извлечение ключей и проверка статусов выполняются
+        встроенными map() и frozenset.issuperset() без цикла на Python.
+        """
+        homeworks = self.validate_envelope(response)
+        try:
+            records = list(map(self._get_fields, homeworks))
+        except (KeyError, TypeError, IndexError):
+            # Медленный путь только ради текста ошибки.
+            for homework in homeworks:
+                self.validate_homework(homework)
+            raise
+        if not self.statuses.issuperset(map(_get_status, records)):
+            for _, status in records:
+                if status not in self.statuses:
+                    self._raise_unknown_status(status)
+        return records
+
+    def _raise_missing_key(self, homework):
+        for key in (self.name_key, self.status_key):
+            if key not in homework:
+                raise KeyError(
+                    f'Отсутствует ожидаемый ключ "{key}" в ответе API.'
+                )
+        raise TypeError(
+            f'Полученный тип данных "{type(homework)}" домашней работы'
+            ' не соответствует ожидаемому типу данных "dict".'
+        )
+
+    def _raise_unknown_status(self, status):
+        raise KeyError(
+            'Недокументированный статус домашней работы'
+            f' "{status}", обнаруженный в ответе API.'
+        )
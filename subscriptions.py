@@ -0,0 +1,424 @@
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from exceptions import SubscriptionError
+
+
+SUBSCRIPTIONS_DB = os.getenv('SUBSCRIPTIONS_DB', 'subscriptions.sqlite3')
+
+DEFAULT_LOCALE = 'ru'
+DEFAULT_POLL_INTERVAL = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    token_id TEXT PRIMARY KEY,
+    chat_ids TEXT NOT NULL,
+    locale TEXT NOT NULL,
+    poll_interval INTEGER NOT NULL,
+    next_due REAL NOT NULL DEFAULT 0
+)
+"""
+
+
+class Subscription:
+    """
+    Подписка: id токена Практикума в хранилище vault.py, чаты
+    получателей и политика опроса. Сами токены в реестре не хранятся.
+    """
+
+    __slots__ = (
+        'token_id', 'chat_ids', 'locale', 'poll_interval', 'next_due'
+    )
+
+    def __init__(self, token_id, chat_ids, locale=DEFAULT_LOCALE,
+                 poll_interval=DEFAULT_POLL_INTERVAL, next_due=0):
+        if not token_id:
+            raise SubscriptionError('Отсутствует id токена в подписке.')
+        if not chat_ids:
+            raise SubscriptionError(
+                f'Для токена "{token_id}" не указаны чаты.'
+            )
+        # Строка "12,34" - не список чатов: без этой проверки она
+        # разобралась бы по символам.
+        if isinstance(chat_ids, str):
+            raise SubscriptionError(
+                f'Чаты токена "{token_id}" должны быть списком: "{chat_ids}".'
+            )
+        try:
+            self.chat_ids = tuple(int(chat_id) for chat_id in chat_ids)
+        except (TypeError, ValueError):
+            raise SubscriptionError(
+                f'Некорректный список чатов токена "{token_id}": {chat_ids}.'
+            )
+        try:
+            self.poll_interval = int(poll_interval)
+            self.next_due = float(next_due)
+        except (TypeError, ValueError):
+            raise SubscriptionError(
+                f'Некорректное расписание токена "{token_id}": '
+                f'интервал "{poll_interval}", опрос "{next_due}".'
+            )
+        if self.poll_interval <= 0:
+            raise SubscriptionError(
+                f'Некорректный интервал опроса "{poll_interval}".'
+            )
+        self.token_id = token_id
+        self.locale = locale
+
+    @classmethod
+    def from_dict(cls, data):
+        """Функция создает подписку из словаря (строки импорта)."""
+        if not isinstance(data, dict):
+            raise SubscriptionError(f'Подписка должна быть объектом: {data}.')
+        try:
+            return cls(
+                data['token_id'],
+                data['chat_ids'],
+                data.get('locale', DEFAULT_LOCALE),
+                data.get('poll_interval', DEFAULT_POLL_INTERVAL),
+                data.get('next_due', 0),
+            )
+        except KeyError as error:
+            raise SubscriptionError(
+                f'Отсутствует ожидаемый ключ {error} в подписке.'
+            )
+
+    def to_dict(self):
+        """Функция возвращает подписку в виде словаря для экспорта."""
+        return {
+            'token_id': self.token_id,
+            'chat_ids': list(self.chat_ids),
+            'locale': self.locale,
+            'poll_interval': self.poll_interval,
+            'next_due': self.next_due,
+        }
+
+    def to_row(self):
+        """Функция возвращает подписку в виде строки таблицы."""
+        return (
+            self.token_id,
+            ','.join(str(chat_id) for chat_id in self.chat_ids),
+            self.locale,
+            self.poll_interval,
+            self.next_due,
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """Функция создает подписку из строки таблицы."""
+        token_id, chat_ids, locale, poll_interval, next_due = row
+        return cls(
+            token_id, chat_ids.split(','), locale, poll_interval, next_due
+        )
+
+
+class _Indexes:
+    """
+    Набор индексов реестра.
+    При перезагрузке строится новый набор и подменяется целиком.
+
+    Записи очереди опроса удаляются лениво: каждая запись несет номер
+    поколения, и действительна только запись с текущим поколением
+    подписки. Добавление и перенос выдают новое поколение, удаление
+    и извлечение из очереди снимают его.
+    """
+
+    def __init__(self):
+        self.by_token_id = {}
+        self.by_chat = {}
+        self.due = []
+        self.generation = {}
+        self._generations = itertools.count()
+
+    def add(self, subscription):
+        self.by_token_id[subscription.token_id] = subscription
+        for chat_id in subscription.chat_ids:
+            self.by_chat.setdefault(chat_id, set()).add(
+                subscription.token_id
+            )
+        self.schedule(subscription)
+
+    def remove(self, token_id):
+        subscription = self.by_token_id.pop(token_id, None)
+        if subscription is None:
+            return None
+        self.generation.pop(token_id, None)
+        for chat_id in subscription.chat_ids:
+            token_ids = self.by_chat.get(chat_id)
+            if token_ids is not None:
+                token_ids.discard(token_id)
+                if not token_ids:
+                    del self.by_chat[chat_id]
+        return subscription
+
+    def schedule(self, subscription):
+        """Функция ставит подписку в очередь опроса взамен старой записи."""
+        generation = next(self._generations)
+        self.generation[subscription.token_id] = generation
+        heapq.heappush(
+            self.due,
+            (subscription.next_due, generation, subscription.token_id)
+        )
+
+    def is_current(self, entry):
+        _, generation, token_id = entry
+        return self.generation.get(token_id) == generation
+
+
+class SubscriptionRegistry:
+    """
+    Реестр подписок с индексами по id токена, чату и времени опроса.
+    Источник данных: локальная база SQLite.
+    """
+
+    def __init__(self, path=SUBSCRIPTIONS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(SCHEMA)
+        self._connection.commit()
+        self._indexes = _Indexes()
+        self._data_version = None
+        self.reload()
+
+    def __len__(self):
+        return len(self._indexes.by_token_id)
+
+    def __iter__(self):
+        return iter(list(self._indexes.by_token_id.values()))
+
+    def __contains__(self, token_id):
+        return token_id in self._indexes.by_token_id
+
+    def get(self, token_id):
+        """Функция возвращает подписку по id токена или None."""
+        return self._indexes.by_token_id.get(token_id)
+
+    def by_chat(self, chat_id):
+        """Функция возвращает подписки, отправляющие сообщения в чат."""
+        indexes = self._indexes
+        return [
+            indexes.by_token_id[token_id]
+            for token_id in indexes.by_chat.get(int(chat_id), ())
+        ]
+
+    def upsert(self, subscription):
+        """Функция добавляет или заменяет подписку."""
+        self.upsert_many([subscription])
+
+    def upsert_many(self, subscriptions):
+        """Функция добавляет подписки пачкой в одной транзакции."""
+        subscriptions = list(subscriptions)
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO subscriptions '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [subscription.to_row() for subscription in subscriptions]
+                )
+            for subscription in subscriptions:
+                self._indexes.remove(subscription.token_id)
+                self._indexes.add(subscription)
+            self._data_version = self._read_data_version()
+
+    def remove(self, token_id):
+        """Функция удаляет подписку. Возвращает удаленную подписку."""
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    'DELETE FROM subscriptions WHERE token_id = ?',
+                    (token_id,)
+                )
+            subscription = self._indexes.remove(token_id)
+            self._data_version = self._read_data_version()
+        return subscription
+
+    def pop_due(self, now=None, limit=None):
+        """
+        Функция извлекает подписки, время опроса которых наступило.
+        Подписки остаются в реестре; после опроса их нужно вернуть
+        в очередь через reschedule().
+        """
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            indexes = self._indexes
+            heap = indexes.due
+            while heap and heap[0][0] <= now:
+                if limit is not None and len(due) >= limit:
+                    break
+                entry = heapq.heappop(heap)
+                # Пропускаем устаревшие записи удаленных/перенесенных подписок.
+                if not indexes.is_current(entry):
+                    continue
+                token_id = entry[2]
+                # До reschedule() подписки в очереди нет.
+                del indexes.generation[token_id]
+                due.append(indexes.by_token_id[token_id])
+        return due
+
+    def next_due_time(self):
+        """Функция возвращает ближайшее время опроса или None."""
+        with self._lock:
+            indexes = self._indexes
+            heap = indexes.due
+            while heap:
+                if indexes.is_current(heap[0]):
+                    return heap[0][0]
+                heapq.heappop(heap)
+        return None
+
+    def reschedule(self, token_id, next_due=None):
+        """
+        Функция назначает следующее время опроса подписки.
+        По умолчанию: текущее время плюс интервал опроса подписки.
+        """
+        with self._lock:
+            subscription = self._indexes.by_token_id.get(token_id)
+            if subscription is None:
+                return
+            if next_due is None:
+                next_due = time.time() + subscription.poll_interval
+            subscription.next_due = float(next_due)
+            self._indexes.schedule(subscription)
+
+    def flush_schedule(self):
+        """Функция сохраняет в базу время следующего опроса подписок."""
+        with self._lock:
+            rows = [
+                (subscription.next_due, subscription.token_id)
+                for subscription in self._indexes.by_token_id.values()
+            ]
+            with self._connection:
+                self._connection.executemany(
+                    'UPDATE subscriptions SET next_due = ? '
+                    'WHERE token_id = ?',
+                    rows
+                )
+            self._data_version = self._read_data_version()
+
+    def reload(self):
+        """
+        Функция перечитывает базу и подменяет индексы целиком.
+        Цикл опроса не останавливается: читатели видят либо старые,
+        либо новые индексы.
+        """
+        indexes = _Indexes()
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT token_id, chat_ids, locale, poll_interval, next_due '
+                'FROM subscriptions'
+            ).fetchall()
+            current = self._indexes.by_token_id
+            for row in rows:
+                subscription = Subscription.from_row(row)
+                # Сохраняем расписание уже известных подписок.
+                known = current.get(subscription.token_id)
+                if known is not None:
+                    subscription.next_due = known.next_due
+                indexes.add(subscription)
+            self._indexes = indexes
+            self._data_version = self._read_data_version()
+
+    def reload_if_changed(self):
+        """
+        Функция перезагружает реестр, если база изменена другим процессом.
+        Возвращает True, если перезагрузка была выполнена.
+        """
+        with self._lock:
+            if self._read_data_version() == self._data_version:
+                return False
+        self.reload()
+        return True
+
+    def close(self):
+        """Функция закрывает соединение с базой."""
+        self._connection.close()
+
+    def _read_data_version(self):
+        return self._connection.execute('PRAGMA data_version').fetchone()[0]
+
+
+def import_subscriptions(registry, stream):
+    """
+    Функция импортирует подписки из потока в формате JSON Lines.
+    Возвращает количество импортированных подписок.
+    """
+    subscriptions = []
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as error:
+            raise SubscriptionError(
+                f'Некорректный JSON в строке {line_number}: {error}'
+            )
+        try:
+            subscriptions.append(Subscription.from_dict(data))
+        except SubscriptionError as error:
+            raise SubscriptionError(f'Ошибка в строке {line_number}: {error}')
+    registry.upsert_many(subscriptions)
+    return len(subscriptions)
+
+
+def export_subscriptions(registry, stream):
+    """
+    Функция выгружает подписки в поток в формате JSON Lines.
+    Возвращает количество выгруженных подписок.
+    """
+    count = 0
+    for subscription in registry:
+        stream.write(json.dumps(subscription.to_dict()) + '\n')
+        count += 1
+    return count
+
+
+def main(argv=None):
+    """Импорт и экспорт подписок из командной строки."""
+    parser = argparse.ArgumentParser(description='Реестр подписок бота.')
+    parser.add_argument('--db', default=SUBSCRIPTIONS_DB,
+                        help='Путь к базе подписок.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser(
+        'import', help='Импортировать подписки из JSON Lines.'
+    )
+    import_parser.add_argument('file', nargs='?', default='-')
+    export_parser = commands.add_parser(
+        'export', help='Выгрузить подписки в JSON Lines.'
+    )
+    export_parser.add_argument('file', nargs='?', default='-')
+    args = parser.parse_args(argv)
+
+    registry = SubscriptionRegistry(args.db)
+    try:
+        if args.command == 'import':
+            if args.file == '-':
+                count = import_subscriptions(registry, sys.stdin)
+            else:
+                with open(args.file, encoding='utf-8') as stream:
+                    count = import_subscriptions(registry, stream)
+            print(f'Импортировано подписок: {count}', file=sys.stderr)
+        else:
+            if args.file == '-':
+                count = export_subscriptions(registry, sys.stdout)
+            else:
+                with open(args.file, 'w', encoding='utf-8') as stream:
+                    count = export_subscriptions(registry, stream)
+            print(f'Выгружено подписок: {count}', file=sys.stderr)
+    except SubscriptionError as error:
+        parser.exit(1, f'{error}\n')
+    finally:
+        registry.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+from analytics import DAY, TurnaroundStats
+from history import StatusHistory
+
+
+HOUR = 60 * 60
+
+
+class TestTurnaroundStats:
+
+    def test_from_history(self, tmp_path):
+        history = StatusHistory(str(tmp_path))
+        history.append_many([
+            (1, 'reviewing', 0.0),
+            (2, 'reviewing', HOUR),
+            (1, 'rejected', 2 * HOUR),
+            (1, 'reviewing', 3 * HOUR),
+            (2, 'approved', 5 * HOUR),
+            (3, 'reviewing', 6 * HOUR),
+            (1, 'approved', DAY + 4 * HOUR),
+        ])
+        stats = TurnaroundStats.from_history(
+            history, {1: 'sprint_1', 2: 'sprint_2'}
+        )
+        history.close()
+
+        assert len(stats) == 3, (
+            'Проверьте подсчет завершенных проверок по истории'
+        )
+        assert stats.median('sprint_1') == (2 * HOUR + DAY + HOUR) / 2
+        assert stats.median('sprint_2') == 4 * HOUR
+
+        stats.update(3, 'approved', 8 * HOUR, 'sprint_2')
+        assert stats.median('sprint_2') == 3 * HOUR, (
+            'Проверьте, что статистика дополняется новыми событиями'
+        )
+
+        rows = stats.report(window=DAY)
+        assert [(row['project'], row['window_start'], row['count'])
+                for row in rows] == [
+            ('sprint_1', 0, 1), ('sprint_1', DAY, 1), ('sprint_2', 0, 2),
+        ]
+
+    def test_incremental_only(self):
+        stats = TurnaroundStats()
+        for homework_id in range(3000):
+            stats.update(homework_id, 'reviewing', 0.0)
+            stats.update(homework_id, 'approved', float(homework_id))
+        assert len(stats) == 3000
+        assert stats.median() == 1499.5
+        assert stats.median('missing') is None
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+
+from events import ErrorOccurred, EventBus, JsonlSink, StatusChanged
+from homework import notify
+from outbox import Outbox
+
+
+class CollectSink:
+    name = 'collect'
+
+    def __init__(self):
+        self.events = []
+
+    def handle(self, event):
+        self.events.append(event)
+
+
+class BlockedSink:
+    name = 'blocked'
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def handle(self, event):
+        self.release.wait()
+
+
+class TestEventBus:
+
+    def test_fan_out(self, tmp_path):
+        path = tmp_path / 'audit.jsonl'
+        bus = EventBus()
+        collect = bus.register(CollectSink())
+        bus.register(JsonlSink(str(path)))
+        homework = {'homework_name': 'hw123', 'status': 'approved'}
+        bus.publish(StatusChanged.from_homework(homework, 'Изменился статус'))
+        bus.publish(ErrorOccurred('Сбой в работе программы'))
+        bus.close(timeout=5)
+
+        assert [event.kind for event in collect.events] == [
+            'status_changed', 'error'
+        ], 'Проверьте, что события доходят до всех приемников'
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert records[0]['homework_name'] == 'hw123'
+
+    def test_slow_sink_does_not_block(self):
+        bus = EventBus(queue_size=2)
+        blocked = bus.register(BlockedSink())
+        collect = bus.register(CollectSink())
+
+        started = time.monotonic()
+        for number in range(10):
+            bus.publish(ErrorOccurred(str(number)))
+        assert time.monotonic() - started < 1, (
+            'Проверьте, что медленный приемник не блокирует публикацию'
+        )
+        assert bus.stats()['blocked']['dropped'] > 0, (
+            'Проверьте, что при переполнении очереди старые события '
+            'отбрасываются'
+        )
+        blocked.release.set()
+        bus.close(timeout=5)
+        assert collect.events[-1].message == '9'
+
+    def test_resubmitted_homework_is_delivered(self, tmp_path):
+        outbox = Outbox(str(tmp_path / 'outbox.jsonl'), lambda message: None)
+        rounds = [
+            ('reviewing', '2021-10-01T10:00:00Z'),
+            ('rejected', '2021-10-02T10:00:00Z'),
+            ('reviewing', '2021-10-03T10:00:00Z'),
+            ('rejected', '2021-10-04T10:00:00Z'),
+        ]
+        for status, date_updated in rounds:
+            event = StatusChanged.from_homework({
+                'id': 1, 'homework_name': 'hw.zip', 'status': status,
+                'date_updated': date_updated,
+            }, status)
+            assert outbox.append(event.key, event.message, event.lane), (
+                'Проверьте, что каждый круг ревью получает свой ключ'
+            )
+        repeated = StatusChanged.from_homework({
+            'id': 1, 'homework_name': 'hw.zip', 'status': 'rejected',
+            'date_updated': '2021-10-04T10:00:00Z',
+        }, 'rejected')
+        assert not outbox.append(repeated.key, 'rejected', repeated.lane)
+        outbox.close()
+
+    def test_duplicate_is_not_published(self, tmp_path):
+        outbox = Outbox(str(tmp_path / 'outbox.jsonl'), lambda message: None)
+        bus = EventBus()
+        collect = bus.register(CollectSink())
+        homework = {
+            'id': 1, 'homework_name': 'hw.zip', 'status': 'approved',
+            'date_updated': '2021-10-04T10:00:00Z',
+        }
+        for _ in range(2):
+            notify(outbox, bus, StatusChanged.from_homework(homework, 'ok'))
+        bus.close(timeout=5)
+        outbox.close()
+        assert len(collect.events) == 1, (
+            'Проверьте, что повторное событие не публикуется на шине'
+        )
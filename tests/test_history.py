@@ -0,0 +1,116 @@
+import os
+import random
+
+import pytest
+
+from events import StatusChanged
+from exceptions import HistoryError
+from history import INDEX_STRIDE, RECORD, HistorySink, StatusHistory, main
+
+
+class TestStatusHistory:
+
+    def test_time_range_query(self, tmp_path):
+        history = StatusHistory(str(tmp_path), segment_records=3000)
+        history.append_many(
+            (number % 50, 'reviewing', 1000.0 + number)
+            for number in range(INDEX_STRIDE * 5)
+        )
+        result = history.query(2000.0, 2100.5)
+        assert [record[0] for record in result] == [
+            1000.0 + number for number in range(1000, 1101)
+        ], 'Проверьте выборку переходов за период'
+        assert all(record[2] == 'reviewing' for record in result)
+        history.close()
+
+        reopened = StatusHistory(str(tmp_path), segment_records=3000)
+        assert len(reopened.query()) == INDEX_STRIDE * 5, (
+            'Проверьте, что история сохраняется между запусками'
+        )
+        reopened.close()
+
+    def test_history_and_compaction(self, tmp_path):
+        history = StatusHistory(str(tmp_path), segment_records=4)
+        transitions = [
+            (1, 'reviewing'), (1, 'reviewing'), (2, 'reviewing'),
+            (1, 'rejected'), (1, 'reviewing'), (1, 'approved'),
+            (3, 'reviewing'), (3, 'reviewing'), (2, 'approved'),
+        ]
+        for timestamp, (homework_id, status) in enumerate(transitions):
+            history.append(homework_id, status, float(timestamp))
+
+        assert [status for _, _, status in history.history(1)] == [
+            'reviewing', 'reviewing', 'rejected', 'reviewing', 'approved'
+        ]
+        kept = history.compact(drop_before=1.0)
+        assert kept == 6
+        assert [status for _, _, status in history.history(1)] == [
+            'reviewing', 'rejected', 'reviewing', 'approved'
+        ], 'Проверьте, что сжатие убирает повторы и старые записи'
+        assert [status for _, _, status in history.history(3)] == [
+            'reviewing'
+        ]
+        assert len(history.query()) == 7
+        history.close()
+
+    def test_position_random(self, tmp_path):
+        history = StatusHistory(str(tmp_path))
+        timestamps = sorted(
+            random.uniform(0, 100) for _ in range(INDEX_STRIDE * 3)
+        )
+        history.append_many((1, 'approved', ts) for ts in timestamps)
+        start, end = sorted((random.uniform(0, 100), random.uniform(0, 100)))
+        expected = [ts for ts in timestamps if start <= ts <= end]
+        assert [record[0] for record in history.query(start, end)] == expected
+        history.close()
+
+    def test_sink_uses_date_updated(self, tmp_path):
+        history = StatusHistory(str(tmp_path))
+        sink = HistorySink(history)
+        homework = {'id': 7, 'homework_name': 'hw.zip', 'status': 'approved'}
+        sink.handle(StatusChanged.from_homework(
+            dict(homework, date_updated='2021-10-09T12:00:00Z'), 'ok'
+        ))
+        sink.handle(StatusChanged.from_homework(homework, 'ok'))
+        (first, _, _), (second, _, _) = history.history(7)
+        assert first == 1633780800.0, (
+            'Проверьте, что в историю пишется время изменения статуса из API'
+        )
+        assert second > first, (
+            'Проверьте, что без date_updated используется время события'
+        )
+        history.close()
+
+    def test_read_only_does_not_touch_writer(self, tmp_path):
+        writer = StatusHistory(str(tmp_path), segment_records=2)
+        writer.append_many((1, 'reviewing', float(ts)) for ts in range(3))
+        # Недописанная запись: писатель еще не закончил ее дописывать.
+        writer._active.write(RECORD.pack(3.0, 1, 2)[:5])
+        writer._active.flush()
+        segment = writer._segments[-1].path
+        size = os.path.getsize(segment)
+
+        reader = StatusHistory(str(tmp_path), read_only=True)
+        assert len(reader.query()) == 3
+        assert os.path.getsize(segment) == size, (
+            'Проверьте, что чтение истории не обрезает сегмент писателя'
+        )
+        with pytest.raises(HistoryError):
+            reader.append(1, 'approved', 4.0)
+
+        writer._active.write(RECORD.pack(3.0, 1, 2)[5:])
+        writer.append_many((1, 'approved', float(ts)) for ts in range(4, 6))
+        assert len(reader.query()) == 6, (
+            'Проверьте, что читатель видит новые записи и сегменты'
+        )
+        reader.close()
+        writer.close()
+
+    def test_read_only_missing_directory(self, tmp_path, capsys):
+        missing = tmp_path / 'missing'
+        with pytest.raises(SystemExit):
+            main(['--dir', str(missing), 'show', '1'])
+        assert not missing.exists(), (
+            'Проверьте, что чтение истории не создает каталог'
+        )
+        assert 'не найден' in capsys.readouterr().err
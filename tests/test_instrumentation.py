@@ -0,0 +1,55 @@
+import logging
+import time
+
+import instrumentation
+
+
+def busy_wait(seconds):
+    finish_at = time.monotonic() + seconds
+    while time.monotonic() < finish_at:
+        pass
+
+
+class TestInstrumentation:
+
+    def test_disabled_returns_original(self, monkeypatch):
+        monkeypatch.setattr(instrumentation, 'TRACE_ENABLED', False)
+
+        def stage():
+            pass
+
+        assert instrumentation.traced('stage')(stage) is stage, (
+            'Проверьте, что без BOT_TRACE функции не оборачиваются'
+        )
+
+    def test_slow_poll_breakdown(self, monkeypatch, caplog):
+        monkeypatch.setattr(instrumentation, 'TRACE_ENABLED', True)
+        monkeypatch.setattr(instrumentation, 'SLOW_POLL', 0.01)
+
+        @instrumentation.traced('test_stage')
+        def stage():
+            time.sleep(0.02)
+
+        with caplog.at_level(logging.WARNING, logger='instrumentation'):
+            instrumentation.poll_started()
+            stage()
+            instrumentation.poll_finished()
+        assert 'test_stage' in caplog.text, (
+            'Проверьте, что медленный опрос пишется в лог с разбивкой '
+            'по этапам'
+        )
+        assert instrumentation.report()['test_stage']['count'] >= 1
+
+    def test_profiler_folded_output(self, tmp_path):
+        profiler = instrumentation.SamplingProfiler(
+            str(tmp_path), interval=0.005
+        )
+        assert profiler.start(duration=0.2)
+        busy_wait(0.3)
+        profiler.join(5)
+        [path] = tmp_path.glob('profile-*.folded')
+        lines = path.read_text().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0 and ';' in stack
+        assert 'busy_wait' in path.read_text()
@@ -0,0 +1,42 @@
+from lanes import LANE_ERROR, LANE_STATUS, LANE_VERDICT, WeightedScheduler
+from outbox import Outbox
+
+
+class TestLanes:
+
+    def test_weighted_choice(self):
+        scheduler = WeightedScheduler()
+        pending = {LANE_VERDICT: 100, LANE_STATUS: 100, LANE_ERROR: 100}
+        chosen = [scheduler.choose(pending, now=1000)[0] for _ in range(14)]
+        assert chosen[0] == LANE_VERDICT, (
+            'Проверьте, что вердикты ревьюера доставляются первыми'
+        )
+        assert chosen.count(LANE_VERDICT) == 8
+        assert chosen.count(LANE_ERROR) == 2
+
+    def test_error_lane_throttled(self):
+        scheduler = WeightedScheduler()
+        scheduler.delivered(LANE_ERROR, created_at=0, now=1000)
+        lane, wait = scheduler.choose({LANE_ERROR: 1}, now=1010)
+        assert lane is None and wait == 20, (
+            'Проверьте, что сообщения об ошибках отправляются '
+            'не чаще заданного интервала'
+        )
+
+    def test_outbox_priority_and_shedding(self, tmp_path):
+        delivered = []
+        outbox = Outbox(str(tmp_path / 'outbox.jsonl'), delivered.append)
+        for number in range(15):
+            outbox.append(f'error-{number}', f'error-{number}', LANE_ERROR)
+        outbox.append('1:approved', 'approved', LANE_VERDICT)
+        stats = outbox.lane_stats()
+        assert stats[LANE_ERROR]['queued'] == 10
+        assert stats[LANE_ERROR]['shed'] == 5
+
+        outbox.start()
+        outbox.close(timeout=5)
+        assert delivered[:2] == ['approved', 'error-5'], (
+            'Проверьте, что вердикт доставлен раньше ошибок, а лишние '
+            'ошибки отброшены'
+        )
+        assert outbox.lane_stats()[LANE_VERDICT]['delivered'] == 1
@@ -0,0 +1,34 @@
+import os
+import signal
+
+from lifecycle import BotState, GracefulShutdown
+
+
+class TestLifecycle:
+
+    def test_signal_interrupts_wait(self):
+        shutdown = GracefulShutdown(timeout=5)
+        previous = signal.getsignal(signal.SIGTERM)
+        try:
+            shutdown.install((signal.SIGTERM,))
+            os.kill(os.getpid(), signal.SIGTERM)
+            assert shutdown.wait(10), (
+                'Проверьте, что SIGTERM прерывает ожидание между опросами'
+            )
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+        assert shutdown.requested
+        assert 0 < shutdown.remaining() <= 5
+
+    def test_state_roundtrip(self, tmp_path):
+        path = str(tmp_path / 'state.json')
+        assert BotState.load(path).current_timestamp is None
+        state = BotState(path, 1633780000, next_poll_at=1000.0)
+        state.save()
+
+        loaded = BotState.load(path)
+        assert loaded.current_timestamp == 1633780000, (
+            'Проверьте, что курсор опроса сохраняется между запусками'
+        )
+        assert loaded.startup_delay(now=400.0) == 600.0
+        assert 0 <= loaded.startup_delay(now=2000.0, jitter=30) <= 30
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+
+import outbox as outbox_module
+from outbox import Outbox
+
+
+class TestOutbox:
+
+    def test_delivery_and_idempotency(self, tmp_path):
+        path = str(tmp_path / 'outbox.jsonl')
+        delivered = []
+        outbox = Outbox(path, delivered.append)
+        outbox.start()
+        assert outbox.append('123:approved', 'Работа проверена')
+        assert not outbox.append('123:approved', 'Работа проверена'), (
+            'Проверьте, что повторное уведомление с тем же ключом '
+            'не ставится на доставку'
+        )
+        outbox.close(timeout=5)
+        assert delivered == ['Работа проверена']
+
+        outbox = Outbox(path, delivered.append)
+        outbox.start()
+        assert not outbox.append('123:approved', 'Работа проверена'), (
+            'Проверьте, что ключи доставленных сообщений '
+            'сохраняются после перезапуска'
+        )
+        outbox.close(timeout=5)
+        assert delivered == ['Работа проверена']
+
+    def test_pending_survive_restart(self, tmp_path):
+        path = str(tmp_path / 'outbox.jsonl')
+        outbox = Outbox(path, lambda message: None)
+        outbox.append('123:reviewing', 'Работа взята на проверку')
+        outbox.close()
+
+        delivered = []
+        outbox = Outbox(path, delivered.append)
+        assert len(outbox) == 1, (
+            'Проверьте, что недоставленные сообщения восстанавливаются '
+            'из журнала'
+        )
+        outbox.start()
+        outbox.close(timeout=5)
+        assert delivered == ['Работа взята на проверку']
+
+    def test_group_commit_and_compaction(self, tmp_path):
+        path = tmp_path / 'outbox.jsonl'
+        outbox = Outbox(str(path), lambda message: None, compact_threshold=50)
+
+        def produce(number):
+            for index in range(50):
+                outbox.append(f'{number}-{index}:approved', 'ok')
+
+        threads = [
+            threading.Thread(target=produce, args=(number,))
+            for number in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(outbox) == 200
+
+        outbox.start()
+        outbox.close(timeout=5)
+        assert len(outbox) == 0
+        # Журнал переписывается, когда новых записей больше, чем живых
+        # (200 ключей), поэтому он не длиннее двух их объемов.
+        assert len(path.read_text().splitlines()) <= 2 * 200 + 1
+
+    def test_compaction_is_amortized(self, tmp_path):
+        path = str(tmp_path / 'outbox.jsonl')
+        outbox = Outbox(path, lambda message: None, compact_threshold=50)
+        compactions = []
+        compact = outbox.compact
+
+        def counting_compact():
+            compactions.append(1)
+            compact()
+
+        outbox.compact = counting_compact
+        for index in range(300):
+            outbox.append(f'{index}:approved', 'ok')
+            outbox.ack(f'{index}:approved')
+        outbox.close()
+        assert 1 <= len(compactions) <= 12, (
+            'Проверьте, что журнал не переписывается при каждом ack '
+            'после накопления ключей доставленных сообщений'
+        )
+
+    def test_torn_tail_is_truncated(self, tmp_path):
+        path = tmp_path / 'outbox.jsonl'
+        outbox = Outbox(str(path), lambda message: None)
+        outbox.append('a', 'первое')
+        outbox.close()
+        with open(path, 'a', encoding='utf-8') as stream:
+            stream.write('{"op": "add", "key": "torn"')
+
+        outbox = Outbox(str(path), lambda message: None)
+        assert outbox.append('b', 'второе')
+        outbox.close()
+
+        delivered = []
+        outbox = Outbox(str(path), delivered.append)
+        outbox.start()
+        outbox.close(timeout=5)
+        assert delivered == ['первое', 'второе'], (
+            'Проверьте, что запись после оборванной строки не теряется'
+        )
+
+    def test_compaction_keeps_unsynced_appends(self, tmp_path):
+        path = str(tmp_path / 'outbox.jsonl')
+        outbox = Outbox(path, lambda message: None)
+        sync = outbox._sync
+
+        def compact_then_sync(seq):
+            # Компактизация из потока доставки между записью и fsync.
+            outbox.compact()
+            sync(seq)
+
+        outbox._sync = compact_then_sync
+        assert outbox.append('a', 'первое')
+        outbox.close()
+
+        assert len(Outbox(path, lambda message: None)) == 1, (
+            'Проверьте, что компактизация не теряет записанное сообщение'
+        )
+
+    def test_undeliverable_message_is_dead_lettered(
+        self, tmp_path, monkeypatch
+    ):
+        monkeypatch.setattr(outbox_module, 'MAX_BACKOFF', 0)
+        path = tmp_path / 'outbox.jsonl'
+        delivered = []
+
+        def deliver(message):
+            if message == 'плохое':
+                raise ValueError('Bad Request: message is too long')
+            delivered.append(message)
+
+        outbox = Outbox(str(path), deliver)
+        outbox.append('bad', 'плохое')
+        outbox.append('good', 'хорошее')
+        outbox.start()
+        deadline = time.monotonic() + 5
+        while len(outbox) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        outbox.close(timeout=5)
+
+        assert delivered == ['хорошее'], (
+            'Проверьте, что недоставляемое сообщение не блокирует полосу'
+        )
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert {'op': 'ack', 'key': 'bad',
+                'error': 'Bad Request: message is too long'} in records
+        assert len(Outbox(str(path), deliver)) == 0
+
+    def test_close_with_timeout_during_delivery(self, tmp_path):
+        path = tmp_path / 'outbox.jsonl'
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def deliver(message):
+            calls.append(message)
+            started.set()
+            release.wait(5)
+
+        outbox = Outbox(str(path), deliver)
+        outbox.append('123:approved', 'Работа проверена')
+        outbox.start()
+        assert started.wait(5)
+        outbox.close(timeout=0.1)
+        release.set()
+        outbox._thread.join(5)
+
+        assert not outbox._thread.is_alive(), (
+            'Проверьте, что поток доставки завершается после close()'
+        )
+        assert calls == ['Работа проверена'], (
+            'Проверьте, что после close() сообщение не отправляется повторно'
+        )
+        restored = Outbox(str(path), deliver)
+        assert len(restored) == 1, (
+            'Проверьте, что неподтвержденное сообщение остается в журнале'
+        )
+        restored.close()
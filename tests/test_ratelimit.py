@@ -0,0 +1,62 @@
+import requests
+
+import upstream
+from ratelimit import HOUR, QuotaLedger, RateLimiter
+
+
+class MockResponse:
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class TestRateLimiter:
+
+    def test_token_budget(self):
+        limiter = RateLimiter(token_period=60, token_burst=2)
+        assert limiter.reserve('token', now=0) == 0
+        assert limiter.reserve('token', now=0) == 0
+        assert limiter.reserve('token', now=0) == 60, (
+            'Проверьте, что опрос откладывается при исчерпании бюджета токена'
+        )
+        assert limiter.reserve('other', now=0) == 0
+        assert limiter.reserve('token', now=60) == 0
+
+    def test_global_budget(self):
+        limiter = RateLimiter(global_period=1, global_burst=1)
+        assert limiter.reserve('first', now=0) == 0
+        assert limiter.reserve('second', now=0) == 1, (
+            'Проверьте общий бюджет запросов для всех токенов'
+        )
+
+    def test_throttled(self):
+        limiter = RateLimiter()
+        limiter.throttled('token', retry_after=120, now=0)
+        assert limiter.reserve('token', now=0) == 120
+
+    def test_ledger(self):
+        ledger = QuotaLedger()
+        ledger.record('token', now=10)
+        ledger.record('token', now=20, rejected=True)
+        ledger.record('token', now=HOUR + 1)
+        assert ledger.report() == {
+            0: {'token': {'calls': 2, 'rejected': 1}},
+            HOUR: {'token': {'calls': 1, 'rejected': 0}},
+        }
+
+    def test_fetch_records_quota(self, monkeypatch):
+        ledger = QuotaLedger()
+        limiter = RateLimiter()
+        monkeypatch.setattr(upstream, 'QUOTA_LEDGER', ledger)
+        monkeypatch.setattr(upstream, 'RATE_LIMITER', limiter)
+        monkeypatch.setattr(
+            requests, 'get',
+            lambda url, **kwargs: MockResponse(429, {'Retry-After': '30'})
+        )
+        upstream.fetch('url', {}, {}, quota_key='token')
+        calls = list(ledger.report().values())[0]['token']
+        assert calls == {'calls': 1, 'rejected': 1}, (
+            'Проверьте учет запросов к API по токенам'
+        )
+        assert 0 < limiter.reserve('token') <= 30
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import requests
+
+from clock import VirtualClock, current_time, use_clock
+import homework
+from recorder import Recorder, read_archive
+from replay import replay
+
+START = 1633780000
+HOMEWORK = {'id': 1, 'homework_name': 'hw.zip', 'lesson_name': 'Финал'}
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.headers = {}
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+def record_session(path):
+    """Архив из четырех опросов: два статуса, повтор и пустой ответ."""
+    recorder = Recorder(path)
+    clock = VirtualClock(START)
+    from_date = START
+    expected = []
+    with use_clock(clock):
+        for number, status in enumerate(
+            ('reviewing', 'reviewing', 'approved', None), start=1
+        ):
+            homeworks = [dict(HOMEWORK, status=status)] if status else []
+            current_date = START + 600 * number
+            recorder.http(
+                {'from_date': from_date},
+                FakeResponse(200, {
+                    'homeworks': homeworks, 'current_date': current_date
+                }),
+                0.25,
+            )
+            if status and number != 2:
+                text = homework.parse_status(homeworks[0])
+                expected.append(text)
+                recorder.telegram(text)
+            if status:
+                from_date = current_date
+            clock.advance(600)
+        text = 'Сбой в работе программы: Отсутствует список домашних работ.'
+        expected.append(text)
+        recorder.telegram(text)
+    recorder.close()
+    return expected
+
+
+class TestReplay:
+
+    def test_virtual_clock_wait(self):
+        clock = VirtualClock(START)
+        event = threading.Event()
+        with use_clock(clock):
+            assert not clock.wait(event, 600)
+            assert current_time() == START + 600, (
+                'Проверьте, что ожидание сдвигает виртуальное время'
+            )
+            event.set()
+            assert clock.wait(event, 600)
+            assert current_time() == START + 600
+
+    def test_archive_roundtrip(self, tmp_path):
+        path = str(tmp_path / 'traffic.jsonl.gz')
+        expected = record_session(path)
+        records = list(read_archive(path))
+        assert [r['text'] for r in records if r['kind'] == 'telegram'] == (
+            expected
+        )
+        assert sum(r['kind'] == 'http' for r in records) == 4
+
+        with open(path, 'rb') as stream:
+            data = stream.read()
+        with open(path, 'wb') as stream:
+            stream.write(data[:-8])
+        assert list(read_archive(path)) == records, (
+            'Проверьте, что оборванный архив читается без исключения'
+        )
+
+    def test_replay_full_pipeline(self, tmp_path):
+        path = str(tmp_path / 'traffic.jsonl.gz')
+        record_session(path)
+
+        report = replay(path, str(tmp_path / 'work'))
+
+        assert report['polls'] == 4
+        assert report['telegram_sent'] == 3
+        assert report['telegram_mismatches'] == 0, (
+            'Проверьте, что воспроизведение повторяет отправленные сообщения'
+        )
+        assert report['cursor_divergence'] == 0, (
+            'Проверьте, что курсор from_date совпадает с записанным'
+        )
+        assert report['virtual_seconds'] >= 3 * 600
+        assert report['speedup'] > 1, (
+            'Проверьте, что ожидания планировщика идут по виртуальному времени'
+        )
+        assert report['lanes']['verdict']['delivered'] == 1
+        calls = sum(
+            usage['calls']
+            for hour in report['quota'].values() for usage in hour.values()
+        )
+        assert calls == 4
+        assert abs(current_time() - time.time()) < 60, (
+            'Проверьте, что после воспроизведения возвращаются реальные часы'
+        )
+
+    def test_replay_recorded_timeout(self, tmp_path):
+        path = str(tmp_path / 'traffic.jsonl.gz')
+        recorder = Recorder(path)
+        reviewing = dict(HOMEWORK, status='reviewing')
+        approved = dict(HOMEWORK, status='approved')
+        with use_clock(VirtualClock(START)):
+            recorder.http({'from_date': START}, FakeResponse(200, {
+                'homeworks': [reviewing], 'current_date': START + 600
+            }), 0.25)
+            recorder.failure(
+                {'from_date': START + 600},
+                requests.ReadTimeout('Read timed out. (read timeout=10)'),
+                10.0
+            )
+            recorder.http({'from_date': START + 600}, FakeResponse(200, {
+                'homeworks': [reviewing], 'current_date': START + 1200
+            }), 0.25)
+            recorder.http({'from_date': START + 1200}, FakeResponse(200, {
+                'homeworks': [approved], 'current_date': START + 1800
+            }), 0.25)
+        recorder.close()
+        assert [r.get('error') for r in read_archive(path)] == [
+            None, 'ReadTimeout', None, None
+        ]
+
+        report = replay(path, str(tmp_path / 'work'))
+        assert report['polls'] == 4
+        assert report['telegram_sent'] == 2, (
+            'Проверьте, что повторенный после таймаута запрос '
+            'не сдвигает воспроизведение'
+        )
+        assert report['cursor_divergence'] == 0
@@ -0,0 +1,39 @@
+import pytest
+
+from schema import HomeworkSchema
+
+
+STATUSES = ('approved', 'reviewing', 'rejected')
+
+
+class TestHomeworkSchema:
+    schema = HomeworkSchema(STATUSES)
+
+    def test_validate(self):
+        response = {'homeworks': [
+            {'homework_name': 'hw1', 'status': 'approved'},
+            {'homework_name': 'hw2', 'status': 'rejected', 'id': 2},
+        ]}
+        assert self.schema.validate(response) == [
+            ('hw1', 'approved'), ('hw2', 'rejected')
+        ]
+
+    @pytest.mark.parametrize('response, error', [
+        ({'current_date': 1}, TypeError),
+        ([{'homeworks': []}], TypeError),
+        ({'homeworks': {'homework_name': 'hw1'}}, TypeError),
+        ({'homeworks': [{'status': 'approved'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw1'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw', 'status': 'new'}]}, KeyError),
+    ])
+    def test_invalid_response(self, response, error):
+        with pytest.raises(error):
+            self.schema.validate(response)
+
+    def test_error_message(self):
+        with pytest.raises(KeyError, match='homework_name'):
+            self.schema.validate_homework({'status': 'unknown'})
+        with pytest.raises(KeyError, match='Недокументированный статус'):
+            self.schema.validate_homework(
+                {'homework_name': 'hw1', 'status': 'unknown'}
+            )
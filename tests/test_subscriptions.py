@@ -0,0 +1,99 @@
+import io
+import json
+
+import pytest
+
+from exceptions import SubscriptionError
+from subscriptions import (
+    Subscription, SubscriptionRegistry, export_subscriptions,
+    import_subscriptions
+)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = SubscriptionRegistry(str(tmp_path / 'subscriptions.sqlite3'))
+    yield registry
+    registry.close()
+
+
+class TestSubscriptionRegistry:
+
+    def test_indexes(self, registry):
+        registry.upsert_many([
+            Subscription('token-1', [1, 2], next_due=10),
+            Subscription('token-2', [2], next_due=5),
+        ])
+        assert registry.get('token-1').chat_ids == (1, 2), (
+            'Проверьте поиск подписки по id токена'
+        )
+        assert {s.token_id for s in registry.by_chat(2)} == {
+            'token-1', 'token-2'
+        }, 'Проверьте поиск подписок по чату'
+
+        due = registry.pop_due(now=7)
+        assert [s.token_id for s in due] == ['token-2'], (
+            'Проверьте выборку подписок по времени опроса'
+        )
+        registry.reschedule('token-2', next_due=20)
+        registry.remove('token-1')
+        assert registry.by_chat(1) == []
+        assert registry.pop_due(now=15) == []
+        assert registry.next_due_time() == 20
+
+    def test_pop_due_with_limit_skips_stale_entries(self, registry):
+        registry.upsert(Subscription('a', [1], next_due=5))
+        registry.upsert(Subscription('a', [1], next_due=5))
+        registry.upsert(Subscription('b', [2], next_due=1))
+        registry.reschedule('b', 6)
+        registry.reschedule('b', 6)
+
+        polled = [
+            [s.token_id for s in registry.pop_due(now=10, limit=1)]
+            for _ in range(3)
+        ]
+        assert polled == [['a'], ['b'], []], (
+            'Проверьте, что подписка не извлекается повторно '
+            'до reschedule()'
+        )
+        assert registry.next_due_time() is None
+        registry.reschedule('a', 8)
+        assert [s.token_id for s in registry.pop_due(now=10)] == ['a']
+
+    def test_hot_reload(self, registry):
+        other = SubscriptionRegistry(registry.path)
+        assert not registry.reload_if_changed()
+        other.upsert(Subscription('token-3', [3]))
+        other.close()
+        assert registry.reload_if_changed(), (
+            'Проверьте, что изменения другого процесса подхватываются'
+        )
+        assert 'token-3' in registry
+
+    def test_import_export(self, registry):
+        lines = '\n'.join(json.dumps(
+            {'token_id': f'token-{i}', 'chat_ids': [i], 'poll_interval': 60}
+        ) for i in range(100))
+        assert import_subscriptions(registry, io.StringIO(lines)) == 100
+        stream = io.StringIO()
+        assert export_subscriptions(registry, stream) == 100
+        assert len(stream.getvalue().splitlines()) == 100
+
+    def test_invalid_subscription(self, registry):
+        with pytest.raises(SubscriptionError):
+            import_subscriptions(
+                registry, io.StringIO(json.dumps({'token_id': 'token'}))
+            )
+
+    @pytest.mark.parametrize('data', [
+        {'token_id': 'student', 'chat_ids': ['x']},
+        {'token_id': 'student', 'chat_ids': '12,34'},
+        {'token_id': 'student', 'chat_ids': [1], 'poll_interval': 'often'},
+        ['student', [1]],
+    ])
+    def test_invalid_fields(self, registry, data):
+        lines = json.dumps({'token_id': 'ok', 'chat_ids': [1]}) + '\n'
+        lines += json.dumps(data)
+        with pytest.raises(SubscriptionError, match='строке 2'):
+            import_subscriptions(registry, io.StringIO(lines))
+        assert len(registry) == 0
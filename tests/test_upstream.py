@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+import requests
+
+from exceptions import PollDeadlineExceeded
+import homework
+from lifecycle import GracefulShutdown
+from recorder import Recorder, read_archive
+import upstream
+
+
+class TestUpstream:
+
+    def test_timeouts_passed(self, monkeypatch):
+        calls = []
+
+        def mock_get(url, **kwargs):
+            calls.append(kwargs)
+            return 'response'
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        assert upstream.fetch('url', {}, {}) == 'response'
+        connect, read = calls[0]['timeout']
+        assert 0 < connect <= upstream.CONNECT_TIMEOUT, (
+            'Проверьте, что запрос к API выполняется с таймаутом соединения'
+        )
+        assert 0 < read <= upstream.READ_TIMEOUT
+
+    def test_retries_within_deadline(self, monkeypatch):
+        calls = []
+
+        def mock_get(url, **kwargs):
+            calls.append(kwargs)
+            raise requests.ConnectionError('connection refused')
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(upstream, 'RETRY_BACKOFF', 0.01)
+        with pytest.raises(requests.ConnectionError):
+            upstream.fetch('url', {}, {})
+        assert len(calls) == upstream.MAX_ATTEMPTS
+
+        with pytest.raises(PollDeadlineExceeded):
+            upstream.fetch('url', {}, {}, deadline=upstream.Deadline(0))
+
+    def test_hedged_request(self, monkeypatch):
+        first_call = threading.Event()
+
+        def mock_get(url, **kwargs):
+            if not first_call.is_set():
+                first_call.set()
+                time.sleep(0.5)
+                return 'slow'
+            return 'fast'
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        started = time.monotonic()
+        result = upstream.fetch('url', {}, {}, hedge_after=0.05)
+        assert result == 'fast', (
+            'Проверьте, что при медленном ответе используется '
+            'дублирующий запрос'
+        )
+        assert time.monotonic() - started < 0.5
+
+    def test_hedged_deadline(self, monkeypatch):
+        monkeypatch.setattr(
+            requests, 'get', lambda url, **kwargs: time.sleep(0.3)
+        )
+        with pytest.raises(PollDeadlineExceeded):
+            upstream.fetch(
+                'url', {}, {}, deadline=upstream.Deadline(0.1),
+                hedge_after=0.05
+            )
+
+    def test_hedging_default_and_recording(self, monkeypatch, tmp_path):
+        first_call = threading.Event()
+
+        class Response:
+            headers = {}
+            status_code = 200
+
+            def __init__(self, body):
+                self.body = body
+
+            def json(self):
+                return self.body
+
+        def mock_get(url, **kwargs):
+            if not first_call.is_set():
+                first_call.set()
+                time.sleep(0.3)
+                return Response('slow')
+            return Response('fast')
+
+        path = str(tmp_path / 'traffic.jsonl.gz')
+        recorder = Recorder(path)
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(upstream, 'HEDGE_AFTER', 0.05)
+        monkeypatch.setattr(upstream, 'RECORDER', recorder)
+        # Потоки предыдущих тестов еще могут занимать общий пул.
+        monkeypatch.setattr(upstream, '_pool', ThreadPoolExecutor(
+            max_workers=upstream.HEDGE_POOL_SIZE
+        ))
+        monkeypatch.setattr(
+            upstream, '_pool_slots',
+            threading.BoundedSemaphore(upstream.HEDGE_POOL_SIZE)
+        )
+        assert upstream.fetch('url', {}, {}).json() == 'fast', (
+            'Проверьте, что HEDGE_AFTER читается при вызове fetch()'
+        )
+        time.sleep(0.4)
+        recorder.close()
+        assert [r['body'] for r in read_archive(path)] == ['fast'], (
+            'Проверьте, что в архив попадает только использованный ответ'
+        )
+
+    def test_shutdown_interrupts_retry(self, monkeypatch):
+        calls = []
+
+        def mock_get(url, **kwargs):
+            calls.append(kwargs)
+            raise requests.ConnectionError(
+                f'<HTTPSConnection object at {hex(id(kwargs))}>'
+            )
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(upstream, 'RETRY_BACKOFF', 5)
+        shutdown = GracefulShutdown()
+        shutdown.request()
+        started = time.monotonic()
+        with pytest.raises(requests.ConnectionError):
+            upstream.fetch('url', {}, {}, shutdown=shutdown)
+        assert len(calls) == 1 and time.monotonic() - started < 1, (
+            'Проверьте, что пауза между попытками прерывается остановкой'
+        )
+
+        monkeypatch.setattr(homework, 'SHUTDOWN', shutdown)
+        messages = set()
+        for _ in range(2):
+            with pytest.raises(ConnectionError) as error:
+                homework.get_api_answer(0)
+            messages.add(str(error.value))
+        assert len(messages) == 1, (
+            'Проверьте, что текст ошибки для Telegram не меняется '
+            'от опроса к опросу'
+        )
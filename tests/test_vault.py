@@ -0,0 +1,130 @@
+import pytest
+import requests
+from cryptography.fernet import Fernet
+
+from exceptions import VaultError
+import homework
+from vault import TokenVault
+
+
+@pytest.fixture
+def vault_path(tmp_path):
+    return str(tmp_path / 'vault.sqlite3')
+
+
+class TestTokenVault:
+
+    def test_headers_cached(self, vault_path):
+        vault = TokenVault(vault_path, Fernet.generate_key().decode())
+        vault.put('student', 'secret')
+        headers = vault.headers('student')
+        assert headers == {'Authorization': 'OAuth secret'}, (
+            'Проверьте формирование заголовков авторизации'
+        )
+        assert vault.headers('student') is headers, (
+            'Проверьте, что повторный запрос заголовков берется из кэша'
+        )
+        vault.close()
+
+    def test_revoke_from_other_process(self, vault_path):
+        key = Fernet.generate_key().decode()
+        vault = TokenVault(vault_path, key)
+        vault.put('student', 'secret')
+        vault.headers('student')
+
+        other = TokenVault(vault_path, key)
+        other.revoke('student')
+        other.close()
+
+        assert vault.refresh_if_changed()
+        with pytest.raises(VaultError):
+            vault.headers('student')
+        vault.close()
+
+    def test_rotate_keys(self, vault_path):
+        old_key = Fernet.generate_key().decode()
+        new_key = Fernet.generate_key().decode()
+        vault = TokenVault(vault_path, old_key)
+        vault.put('student', 'secret')
+        assert vault.rotate_keys(f'{new_key},{old_key}') == 1
+        vault.close()
+
+        vault = TokenVault(vault_path, new_key)
+        assert vault.headers('student') == {'Authorization': 'OAuth secret'}
+        vault.close()
+
+    def test_rotation_with_deployed_key(self, vault_path):
+        old_key = Fernet.generate_key().decode()
+        new_key = Fernet.generate_key().decode()
+        running = TokenVault(vault_path, f'{old_key},{new_key}')
+        running.put('student', 'secret')
+        running.headers('student')
+
+        admin = TokenVault(vault_path, old_key)
+        admin.rotate_keys(f'{new_key},{old_key}')
+        admin.close()
+
+        assert running.refresh_if_changed()
+        assert running.headers('student') == {
+            'Authorization': 'OAuth secret'
+        }, (
+            'Проверьте, что процесс с добавленным новым ключом читает '
+            'токены после ротации'
+        )
+        running.close()
+
+    def test_cache_bounded(self, vault_path):
+        vault = TokenVault(
+            vault_path, Fernet.generate_key().decode(), cache_size=2
+        )
+        vault.put_many((f'student-{i}', f'secret-{i}') for i in range(5))
+        for i in range(5):
+            vault.headers(f'student-{i}')
+        assert len(vault._cache) == 2
+        vault.close()
+
+    def test_poll_uses_vault_headers(self, vault_path, monkeypatch):
+        vault = TokenVault(vault_path, Fernet.generate_key().decode())
+        vault.put('student', 'secret')
+        calls = []
+
+        class Response:
+            status_code = 200
+            headers = {}
+
+            def json(self):
+                return {'homeworks': [], 'current_date': 0}
+
+        def mock_get(url, **kwargs):
+            calls.append(kwargs['headers'])
+            return Response()
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(homework, 'VAULT', vault)
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN_ID', 'student')
+        homework.get_api_answer(0)
+        assert calls == [{'Authorization': 'OAuth secret'}], (
+            'Проверьте, что при PRACTICUM_TOKEN_ID токен берется '
+            'из хранилища'
+        )
+
+        vault.revoke('student')
+        with pytest.raises(VaultError):
+            homework.get_api_answer(0)
+        vault.close()
+
+    @pytest.mark.parametrize('keys', [None, 'not-a-key'])
+    def test_check_tokens_reports_vault_keys(self, keys, monkeypatch,
+                                             caplog):
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', None)
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN_ID', 'student')
+        monkeypatch.setattr(homework, 'VAULT_KEYS', keys)
+        monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', 'token')
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 'chat')
+        assert not homework.check_tokens(), (
+            'Проверьте, что без корректных VAULT_KEYS бот не запускается'
+        )
+        assert 'VAULT_KEYS' in caplog.text
+        assert homework.VAULT is None, (
+            'Проверьте, что хранилище не открывается до check_tokens()'
+        )
@@ -0,0 +1,183 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http import HTTPStatus
+import logging
+import os
+import threading
+import time
+
+import requests
+
+from exceptions import PollDeadlineExceeded
+from ratelimit import QUOTA_LEDGER, RATE_LIMITER, THROTTLED_BACKOFF
+from recorder import RECORDER
+
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+POLL_DEADLINE = 20
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 1
+
+# Через сколько секунд без ответа отправлять дублирующий запрос.
+# По умолчанию дублирующие запросы выключены.
+HEDGE_AFTER = os.getenv('HEDGE_AFTER')
+HEDGE_AFTER = float(HEDGE_AFTER) if HEDGE_AFTER else None
+HEDGE_POOL_SIZE = 4
+
+logger = logging.getLogger(__name__)
+
+_pool = ThreadPoolExecutor(
+    max_workers=HEDGE_POOL_SIZE, thread_name_prefix='upstream'
+)
+_pool_slots = threading.BoundedSemaphore(HEDGE_POOL_SIZE)
+
+
+class Deadline:
+    """Общий срок на один опрос, включая все повторные попытки."""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def clamp(self, seconds):
+        """Функция ограничивает таймаут оставшимся до срока временем."""
+        return min(seconds, self.remaining())
+
+
+def fetch(url, headers, params, deadline=None, hedge_after=None,
+          quota_key=None, shutdown=None):
+    """
+    Функция выполняет GET-запрос с таймаутами на соединение и чтение,
+    повторяет его при сетевых сбоях и укладывается в общий срок опроса.
+    При заданном hedge_after (по умолчанию HEDGE_AFTER) медленный запрос
+    дублируется.
+    Каждый отправленный запрос учитывается в QUOTA_LEDGER по quota_key.
+    Пауза между попытками прерывается остановкой shutdown.
+    """
+    deadline = deadline or Deadline(POLL_DEADLINE)
+    if hedge_after is None:
+        hedge_after = HEDGE_AFTER
+    attempt = 0
+    while True:
+        attempt += 1
+        if deadline.expired():
+            raise PollDeadlineExceeded(
+                f'Истек срок опроса API ({POLL_DEADLINE} с).'
+            )
+        timeout = (
+            deadline.clamp(CONNECT_TIMEOUT), deadline.clamp(READ_TIMEOUT)
+        )
+        try:
+            return _attempt(
+                url, headers, params, timeout, deadline, hedge_after,
+                quota_key
+            )
+        except (requests.ConnectionError, requests.Timeout) as error:
+            backoff = RETRY_BACKOFF * attempt
+            if attempt >= MAX_ATTEMPTS or deadline.remaining() <= backoff:
+                raise
+            logger.warning(
+                f'Попытка {attempt} запроса к API не удалась: {error}.'
+            )
+            if shutdown is None:
+                time.sleep(backoff)
+            elif shutdown.wait(backoff):
+                raise
+
+
+def _attempt(url, headers, params, timeout, deadline, hedge_after,
+             quota_key):
+    # В архив BOT_RECORD попадает одна запись на попытку: ответ, который
+    # получил вызывающий код (из дублирующих - победивший), или сбой.
+    started = time.perf_counter()
+    try:
+        if hedge_after is None:
+            response = _request(url, headers, params, timeout, quota_key)
+        else:
+            response = _hedged_get(
+                url, headers, params, timeout, deadline, hedge_after,
+                quota_key
+            )
+    except Exception as error:
+        if RECORDER is not None:
+            RECORDER.failure(params, error, time.perf_counter() - started)
+        raise
+    if RECORDER is not None:
+        RECORDER.http(params, response, time.perf_counter() - started)
+    return response
+
+
+def _request(url, headers, params, timeout, quota_key):
+    response = requests.get(
+        url, headers=headers, params=params, timeout=timeout
+    )
+    if quota_key is not None:
+        rejected = response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        QUOTA_LEDGER.record(quota_key, rejected=rejected)
+        if rejected:
+            retry_after = response.headers.get('Retry-After', '')
+            RATE_LIMITER.throttled(
+                quota_key,
+                float(retry_after) if retry_after.isdigit()
+                else THROTTLED_BACKOFF
+            )
+    return response
+
+
+def _hedged_get(url, headers, params, timeout, deadline, hedge_after,
+                quota_key):
+    futures = [_submit(url, headers, params, timeout, quota_key)]
+    if futures[0] is None:
+        # Пул занят зависшими запросами: выполняем запрос сами.
+        return _request(url, headers, params, timeout, quota_key)
+    done, _ = wait(futures, timeout=deadline.clamp(hedge_after))
+    if not done:
+        hedge = _submit(url, headers, params, timeout, quota_key)
+        if hedge is not None:
+            logger.info(
+                f'Ответ API не получен за {hedge_after} с,'
+                ' отправлен дублирующий запрос.'
+            )
+            futures.append(hedge)
+
+    error = None
+    pending = futures
+    while pending:
+        done, pending = wait(
+            pending, timeout=deadline.remaining(),
+            return_when=FIRST_COMPLETED
+        )
+        if not done:
+            raise PollDeadlineExceeded(
+                f'Истек срок опроса API ({POLL_DEADLINE} с).'
+            )
+        for future in done:
+            try:
+                return future.result()
+            except Exception as future_error:
+                error = future_error
+    raise error
+
+
+def _submit(url, headers, params, timeout, quota_key):
+    # Свободный слот означает свободный поток: очередь пула не растет,
+    # даже если API перестал отвечать.
+    if not _pool_slots.acquire(blocking=False):
+        return None
+
+    def run():
+        try:
+            return _request(url, headers, params, timeout, quota_key)
+        finally:
+            _pool_slots.release()
+
+    try:
+        return _pool.submit(run)
+    except RuntimeError:
+        _pool_slots.release()
+        raise
@@ -0,0 +1,235 @@
+import argparse
+from collections import OrderedDict
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from exceptions import VaultError
+
+
+VAULT_DB = os.getenv('VAULT_DB', 'vault.sqlite3')
+VAULT_KEYS = os.getenv('VAULT_KEYS')
+
+CACHE_SIZE = 4096
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    token_id TEXT PRIMARY KEY,
+    ciphertext BLOB NOT NULL,
+    revoked INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def build_headers(token):
+    """Функция возвращает заголовки авторизации для API Практикума."""
+    return {'Authorization': f'OAuth {token}'}
+
+
+def load_keys(keys=VAULT_KEYS):
+    """
+    Функция разбирает ключи шифрования из строки через запятую.
+    Первый ключ используется для шифрования, остальные только
+    для расшифровки (ротация ключей).
+    """
+    if not keys:
+        raise VaultError(
+            'Отсутствует переменная окружения "VAULT_KEYS".'
+        )
+    try:
+        return MultiFernet(
+            [Fernet(key.strip()) for key in keys.split(',')]
+        )
+    except ValueError:
+        raise VaultError(
+            'Некорректный ключ в переменной окружения "VAULT_KEYS".'
+        )
+
+
+class TokenVault:
+    """
+    Зашифрованное хранилище токенов Практикума.
+    Расшифрованные токены хранятся в ограниченном кэше сразу
+    в виде готовых заголовков, поэтому повторный запрос заголовков
+    стоит одного обращения к словарю.
+    """
+
+    def __init__(self, path=VAULT_DB, keys=VAULT_KEYS, cache_size=CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._fernet = load_keys(keys)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(SCHEMA)
+        self._connection.commit()
+        self._data_version = self._read_data_version()
+
+    def __contains__(self, token_id):
+        return self._load(token_id) is not None
+
+    def put(self, token_id, token):
+        """Функция сохраняет (или заменяет) токен в хранилище."""
+        self.put_many([(token_id, token)])
+
+    def put_many(self, items):
+        """Функция сохраняет токены пачкой в одной транзакции."""
+        now = time.time()
+        rows = [
+            (token_id, self._fernet.encrypt(token.encode()), now)
+            for token_id, token in items
+        ]
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO tokens '
+                    '(token_id, ciphertext, revoked, updated_at) '
+                    'VALUES (?, ?, 0, ?)',
+                    rows
+                )
+            for token_id, _, _ in rows:
+                self._cache.pop(token_id, None)
+            self._data_version = self._read_data_version()
+
+    def revoke(self, token_id):
+        """Функция отзывает токен: заголовки для него больше не выдаются."""
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    'UPDATE tokens SET revoked = 1, updated_at = ? '
+                    'WHERE token_id = ?',
+                    (time.time(), token_id)
+                )
+            self._cache.pop(token_id, None)
+            self._data_version = self._read_data_version()
+
+    def headers(self, token_id):
+        """
+        Функция возвращает заголовки авторизации для токена.
+        Отозванный или неизвестный токен приводит к VaultError.
+        Возвращаемый словарь общий для всех вызовов, его нельзя изменять.
+        """
+        # Попадание в кэш обходится без блокировки и расшифровки.
+        headers = self._cache.get(token_id)
+        if headers is not None:
+            return headers
+        headers = self._load(token_id)
+        if headers is None:
+            raise VaultError(
+                f'Токен "{token_id}" отсутствует в хранилище или отозван.'
+            )
+        return headers
+
+    def rotate_keys(self, keys):
+        """
+        Функция перешифровывает все токены новым основным ключом.
+        Новая строка ключей должна содержать и старый ключ.
+        Ключи остальных процессов не меняются: до ротации новый ключ
+        нужно добавить в VAULT_KEYS каждого процесса и перезапустить их.
+        """
+        fernet = load_keys(keys)
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT token_id, ciphertext FROM tokens'
+            ).fetchall()
+            with self._connection:
+                self._connection.executemany(
+                    'UPDATE tokens SET ciphertext = ? WHERE token_id = ?',
+                    [(fernet.rotate(ciphertext), token_id)
+                     for token_id, ciphertext in rows]
+                )
+            self._fernet = fernet
+            self._data_version = self._read_data_version()
+        return len(rows)
+
+    def refresh_if_changed(self):
+        """
+        Функция сбрасывает кэш, если хранилище изменено другим процессом.
+        Так отзыв и замена токенов вступают в силу без перезапуска.
+        Ключи шифрования при этом не перечитываются (см. rotate_keys).
+        """
+        with self._lock:
+            data_version = self._read_data_version()
+            if data_version == self._data_version:
+                return False
+            self._cache.clear()
+            self._data_version = data_version
+        return True
+
+    def close(self):
+        """Функция закрывает соединение с хранилищем."""
+        self._connection.close()
+
+    def _load(self, token_id):
+        with self._lock:
+            headers = self._cache.get(token_id)
+            if headers is not None:
+                return headers
+            row = self._connection.execute(
+                'SELECT ciphertext FROM tokens '
+                'WHERE token_id = ? AND revoked = 0',
+                (token_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                token = self._fernet.decrypt(row[0]).decode()
+            except InvalidToken:
+                raise VaultError(
+                    f'Не удалось расшифровать токен "{token_id}". '
+                    'Проверьте ключи "VAULT_KEYS".'
+                )
+            headers = build_headers(token)
+            self._cache[token_id] = headers
+            # Вытесняется самая давно расшифрованная запись.
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return headers
+
+    def _read_data_version(self):
+        return self._connection.execute('PRAGMA data_version').fetchone()[0]
+
+
+def main(argv=None):
+    """Управление хранилищем токенов из командной строки."""
+    parser = argparse.ArgumentParser(description='Хранилище токенов бота.')
+    parser.add_argument('--db', default=VAULT_DB,
+                        help='Путь к хранилищу токенов.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('generate-key', help='Сгенерировать новый ключ.')
+    put_parser = commands.add_parser(
+        'put', help='Сохранить токен, прочитанный из stdin.'
+    )
+    put_parser.add_argument('token_id')
+    revoke_parser = commands.add_parser('revoke', help='Отозвать токен.')
+    revoke_parser.add_argument('token_id')
+    rotate_parser = commands.add_parser(
+        'rotate', help='Перешифровать токены новым набором ключей.'
+    )
+    rotate_parser.add_argument('keys')
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate-key':
+        print(Fernet.generate_key().decode())
+        return
+
+    vault = TokenVault(args.db)
+    try:
+        if args.command == 'put':
+            vault.put(args.token_id, sys.stdin.readline().strip())
+        elif args.command == 'revoke':
+            vault.revoke(args.token_id)
+        else:
+            count = vault.rotate_keys(args.keys)
+            print(f'Перешифровано токенов: {count}', file=sys.stderr)
+    finally:
+        vault.close()
+
+
+if __name__ == '__main__':
+    main()